@@ -0,0 +1,369 @@
+# Étape IA : analyse fun des messages de chaque auteur avec l'API Anthropic.
+# Importé seulement par la commande "ai" (et l'analyse complète) : anthropic n'est jamais chargé ailleurs.
+import asyncio
+import os
+
+from anthropic import AsyncAnthropic
+
+from ai_engine import AnalysisEngine
+from author_files import read_author_lines, read_author_shards
+from batch_jobs import run_batches
+from instrumentation import span
+from message_index import MessageIndex, index_dir
+from response_cache import ResponseCache, response_key
+from segmenter import pack_segments
+from term_matrix import TermMatrix, matrix_dir, matrix_is_current
+from tree_reduce import tree_reduce
+
+# === Config ===
+CHUNK_TOKEN_LIMIT = 2000  # Taille des segments envoyés à l'IA, en tokens (modèle haiku)
+TEST_GIS = True  # MODE TEST : n'analyser que 5 segments de Gis (ignoré en mode lot)
+AI_MAX_CONCURRENCY = 8  # Appels API simultanés au maximum
+AI_REQUESTS_PER_MINUTE = 50  # Limites de débit de l'API (voir la console Anthropic pour votre palier)
+AI_TOKENS_PER_MINUTE = 50000
+AI_MAX_RETRIES = 5  # Retentatives sur 429 (rate limit) et 529 (surcharge), avec backoff exponentiel
+AI_BATCH_POLL_SECONDS = 60  # Intervalle de vérification de l'état des lots (mode --ai-batch)
+AI_RETRIEVAL_PER_CATEGORY = 40  # Messages retenus par catégorie et par auteur en mode recherche (--ai-retrieval)
+AI_CACHE_MAX_AGE_DAYS = 90  # Réponses IA gardées en cache (.godvoice_cache/ai_responses.sqlite)
+AI_CACHE_MAX_MB = 100
+
+# Choix du modèle selon la qualité demandée (segment_tokens : budget de chaque segment de messages,
+# reduce_tokens : budget des analyses fusionnées dans un même prompt d'agrégation)
+model_configs = {
+    "haiku": {"model": "claude-3-5-haiku-20241022", "max_tokens": 400,
+              "segment_tokens": CHUNK_TOKEN_LIMIT, "reduce_tokens": 6000},
+    "sonnet": {"model": "claude-3-5-sonnet-20241022", "max_tokens": 800,  # QUALITÉ PREMIUM
+               "segment_tokens": 3750, "reduce_tokens": 10000},
+    "opus": {"model": "claude-3-opus-20240229", "max_tokens": 1000,
+             "segment_tokens": 5000, "reduce_tokens": 12000}
+}
+
+# Catégories fun, croustillantes et clivantes à garder
+fun_analysis_types = [
+    "sarcasm_meter",
+    "clash_detector",
+    "meme_potential",
+    "drama_queen",
+    "ai_sucker",
+    "political_fun_scale",
+    "bullshit_meter"
+]
+
+# Mots-clés de chaque catégorie pour le mode recherche (accents et majuscules ignorés par l'index)
+category_keywords = {
+    "sarcasm_meter": "mdr ptdr lol bravo génial évidemment bien sûr sérieux ironie wow super merci champion",
+    "clash_detector": "nul ferme gueule idiot débile con abruti ridicule honte menteur tg pathétique",
+    "meme_potential": "meme mdr ptdr jpp mort dead culte légendaire photo vidéo gif",
+    "drama_queen": "jamais toujours catastrophe horrible pire incroyable drame pleure crise omg grave",
+    "ai_sucker": "ia chatgpt gpt claude bot robot intelligence artificielle prompt openai",
+    "political_fun_scale": "macron politique gauche droite rn lfi vote élection impôts grève gouvernement président",
+    "bullshit_meter": "vrai fake faux rumeur soi-disant paraît source preuve jure promis",
+}
+
+
+def retrieve_author_lines(index, author, per_category=AI_RETRIEVAL_PER_CATEGORY):
+    # Meilleurs messages de l'auteur pour chaque catégorie, dédoublonnés et remis dans l'ordre du chat,
+    # au même format que all_messages.txt
+    doc_ids = set()
+    for category in fun_analysis_types:
+        found, _ = index.search_ids(category_keywords[category].split(), author=author, limit=per_category)
+        doc_ids.update(found.tolist())
+    return [f"[{index.format_timestamp(doc_id)}] {index.message(doc_id)}\n" for doc_id in sorted(doc_ids)]
+
+
+def read_segments_for_ai(author, run_config, budget, index=None):
+    # Messages entiers regroupés en segments d'au plus budget tokens ; None si l'auteur n'a rien.
+    # Avec un index (mode recherche) : extraits ciblés ; sinon tous les messages de l'auteur, en
+    # reprenant tels quels les shards de by_authors/ s'ils tiennent dans le budget du modèle
+    if index is not None:
+        lines = retrieve_author_lines(index, author) or None
+    else:
+        if run_config.author_shard_tokens and run_config.author_shard_tokens <= budget:
+            shards = read_author_shards(run_config.output_dir, author)
+            if shards is not None:
+                return shards
+        lines = read_author_lines(run_config.output_dir, author)
+    return pack_segments(lines, budget) if lines is not None else None
+
+
+# Versions des gabarits de prompt : à incrémenter quand leur texte change (invalide le cache des réponses)
+SEGMENT_PROMPT_VERSION = 1
+AGGREGATION_PROMPT_VERSION = 3
+MERGE_PROMPT_VERSION = 1
+
+
+def build_segment_request(text, author, batch_info=None):
+    # Prompt d'analyse d'un segment et sa clé de cache (partagés par les appels directs et les lots)
+    # Prompt allégé et contextuel
+    prompt = (
+        f"Contexte : Ceci est une conversation privée entre amis proches, tous consentants et habitués à l'humour, la vanne et le sarcasme. "
+        f"Le but est de faire une analyse fun, croustillante et clivante, dans l'esprit d'un roast amical, sans jamais être méchant gratuitement.\n\n"
+        f"Pour {author}, fais une analyse rapide sur ces points :\n"
+        "- Niveau de sarcasme et d'humour (avec exemples)\n"
+        "- Style de clash ou de vanne (avec exemples)\n"
+        "- Potentiel de meme (messages ou situations à transformer en meme)\n"
+        "- Moments de drama queen (exagérations, réactions épiques)\n"
+        "- Score AI Sucker (essaie-t-il de piéger l'IA ?)\n"
+        "- Orientation politique sur l'échelle fun (de communiste extrémiste à FN master, avec justification marrante)\n"
+        "- Taux de mensonge, bullshit ou fakenews dans ses propos (avec exemples drôles ou exagérés)\n"
+        "- Propose un surnom fun qui résume son style dans le groupe\n"
+        "- Donne un score sur 10 pour chaque catégorie\n"
+        "- Conclus par une phrase punchy et bienveillante\n"
+    )
+    if batch_info:
+        prompt += f"\n[Analyse du lot {batch_info['current']} sur {batch_info['total']} pour {author}. Ce lot n'est qu'une partie de la conversation. Analyse ce lot précisément, mais ne conclus pas sur l'ensemble.]"
+    # Segment envoyé en entier (déjà dimensionné par pack_segments).
+    # Clé de cache sans le numéro du lot : un segment inchangé reste en cache quand le chat grandit
+    return f"{prompt}\n\nMessages de {author} :\n{text}", (SEGMENT_PROMPT_VERSION, author, text)
+
+
+async def analyze_with_anthropic_multi(engine, text, author, analysis_types=None, model_name="haiku", batch_info=None):
+    if analysis_types is None:
+        analysis_types = fun_analysis_types
+    config = model_configs.get(model_name, model_configs["haiku"])
+    content, cache_key = build_segment_request(text, author, batch_info)
+    try:
+        return await engine.create(config["model"], config["max_tokens"], content, cache_key=cache_key)
+    except Exception as e:
+        print(f"Erreur Anthropic (multi) pour {author}: {e}")
+        return None
+
+
+async def merge_batch_analyses(engine, batch_analyses, author, analysis_types, model_name):
+    # Nœud intermédiaire de l'arbre : plusieurs analyses partielles -> une seule, toujours partielle
+    config = model_configs.get(model_name, model_configs["haiku"])
+    merge_prompt = (
+        f"Voici plusieurs analyses partielles des messages de {author} pour les catégories fun suivantes : {', '.join(analysis_types)}.\n"
+        "Fusionne-les en UNE seule analyse partielle : pour chaque catégorie, garde les exemples, punchlines et faits marquants les plus forts, "
+        "et une note sur 10 qui tient compte de toutes les analyses. Ne conclus pas : d'autres analyses seront ajoutées ensuite.\n"
+        "Voici les analyses partielles :\n\n"
+        + "\n\n---\n\n".join(batch_analyses)
+    )
+    try:
+        return await engine.create(config["model"], config["max_tokens"], merge_prompt,
+                                   cache_key=(MERGE_PROMPT_VERSION, merge_prompt))
+    except Exception as e:
+        print(f"Erreur Fusion Anthropic (multi) pour {author}: {e}")
+        return None
+
+
+async def aggregate_batches_with_anthropic_multi(engine, batch_analyses, author, analysis_types=None, model_name="haiku",
+                                                 vocabulary=None):
+    if analysis_types is None:
+        analysis_types = fun_analysis_types
+    config = model_configs.get(model_name, model_configs["haiku"])
+    aggregation_prompt = (
+        f"Voici les analyses de tous les lots de messages de {author} pour les catégories fun suivantes : {', '.join(analysis_types)}.\n"
+        "Pour chaque catégorie :\n"
+        "- Donne 5 bullet points synthétiques (faits marquants, exemples, punchlines, etc)\n"
+        "- Puis rédige un paragraphe de 4 à 5 lignes qui explique en détail la note sur 10, avec des exemples, des nuances, et une vraie interprétation du style ou du comportement.\n"
+        "Sois fun, croustillant, mais aussi analytique et nuancé.\n"
+        "À la fin, propose un surnom fun, et calcule un score final 'AI Sucker' sur 100 basé sur l'ensemble des catégories, en expliquant comment tu l'as calculé.\n"
+        "Rappelle que c'est un jeu entre amis consentants. Sois drôle, créatif, et adapte-toi à l'esprit du groupe (humour, clash, etc).\n"
+        # Vocabulaire précalculé sur TOUS les messages de l'auteur (term_matrix.py), quelques lignes seulement
+        + (f"Vocabulaire de {author} sur l'ensemble du chat (tics de langage, à exploiter) :\n{vocabulary}\n" if vocabulary else "")
+        + "Voici les analyses par lot :\n\n"
+        + "\n\n---\n\n".join(batch_analyses)
+    )
+    try:
+        return await engine.create(config["model"], config["max_tokens"], aggregation_prompt,
+                                   cache_key=(AGGREGATION_PROMPT_VERSION, aggregation_prompt))
+    except Exception as e:
+        print(f"Erreur Agrégation Anthropic (multi) pour {author}: {e}")
+        return None
+
+
+async def analyze_author(engine, author, segments, model_name, vocabulary=None):
+    # Fan-out : tous les segments de l'auteur partent en même temps (dans les limites du moteur),
+    # fan-in : l'agrégation démarre dès que le dernier segment de CET auteur est revenu.
+    # Renvoie (analyse finale, trace de l'arbre d'agrégation)
+    config = model_configs.get(model_name, model_configs["haiku"])
+    total_segments = len(segments)
+    done = 0
+
+    async def analyze_segment(idx, segment):
+        nonlocal done
+        batch_info = {'current': idx+1, 'total': total_segments}
+        result = await analyze_with_anthropic_multi(engine, segment, author, fun_analysis_types, model_name, batch_info)
+        done += 1
+        print(f"    [{author}] Segment {idx+1}/{total_segments} terminé ({int(100 * done / total_segments)}%)")
+        return result
+
+    with span("author", author=author, segments=total_segments):
+        results = await asyncio.gather(*(analyze_segment(idx, segment) for idx, segment in enumerate(segments)))
+    # Ordre des lots conservé pour l'agrégation
+    batch_analyses = [result for result in results if result]
+    if len(batch_analyses) < total_segments:
+        print(f"  ⚠️  [{author}] {total_segments - len(batch_analyses)} segment(s) sans analyse")
+    if not batch_analyses:
+        return None, None
+    # Agrégation en arbre : les analyses sont fusionnées par groupes qui tiennent dans le budget,
+    # niveau par niveau, jusqu'à un seul prompt final (rien n'est tronqué)
+    with span("aggregation", author=author, analyses=len(batch_analyses)):
+        final_result, trace = await tree_reduce(
+            batch_analyses, config['reduce_tokens'],
+            merge=lambda group, level, index: merge_batch_analyses(engine, group, author, fun_analysis_types, model_name),
+            final=lambda group: aggregate_batches_with_anthropic_multi(engine, group, author, fun_analysis_types, model_name,
+                                                                       vocabulary),
+        )
+    print(f"  🌳 [{author}] {len(batch_analyses)} analyses agrégées en {trace.depth} niveau(x) : {trace.describe()}")
+    return final_result, trace
+
+
+async def submit_segment_batches(client, cache, author_segments, model_name):
+    # Mode lot : les analyses de segments passent par l'API Message Batches et arrivent
+    # dans le cache des réponses ; l'agrégation qui suit les y retrouve sans nouvel appel
+    config = model_configs.get(model_name, model_configs["haiku"])
+    requests = {}
+    for author, segments in author_segments.items():
+        for idx, segment in enumerate(segments):
+            batch_info = {'current': idx+1, 'total': len(segments)}
+            content, cache_key = build_segment_request(segment, author, batch_info)
+            requests[response_key(config["model"], config["max_tokens"], *cache_key)] = {
+                "model": config["model"],
+                "max_tokens": config["max_tokens"],
+                "messages": [{"role": "user", "content": content}],
+            }
+    await run_batches(client, requests, cache, poll_interval=AI_BATCH_POLL_SECONDS)
+
+
+async def analyze_authors(api_key, author_segments, model_name, batch_mode=False, vocabularies=None):
+    # Tous les auteurs en parallèle : la durée totale ≈ celle de l'auteur le plus long.
+    # vocabularies : auteur -> résumé de son vocabulaire (TermMatrix.describe_author), ajouté à l'agrégation finale
+    vocabularies = vocabularies or {}
+    with ResponseCache(max_age_days=AI_CACHE_MAX_AGE_DAYS, max_bytes=AI_CACHE_MAX_MB * 1024 * 1024) as cache:
+        async with AsyncAnthropic(api_key=api_key, max_retries=0) as client:
+            if batch_mode:
+                with span("batches"):
+                    await submit_segment_batches(client, cache, author_segments, model_name)
+            engine = AnalysisEngine(client, max_concurrency=AI_MAX_CONCURRENCY,
+                                    requests_per_minute=AI_REQUESTS_PER_MINUTE,
+                                    tokens_per_minute=AI_TOKENS_PER_MINUTE, max_retries=AI_MAX_RETRIES,
+                                    cache=cache)
+            results = await asyncio.gather(*(analyze_author(engine, author, segments, model_name, vocabularies.get(author))
+                                             for author, segments in author_segments.items()))
+        print(f"  💾 Cache des réponses : {cache.hits} trouvée(s), {cache.misses} manquante(s)")
+    usage = engine.stats
+    print(f"  📡 {usage.calls} appels API ({usage.retries} retentatives, {usage.errors} erreurs), "
+          f"{usage.input_tokens:,} tokens en entrée, {usage.output_tokens:,} en sortie")
+    return dict(zip(author_segments, results))
+
+
+@span("ai")
+def run_ai_analysis(run_config, stats, batch_mode=False, retrieval_mode=False, digest=None):
+    # run_config : RunConfig de pipeline.py ; stats : statistiques par auteur (choix des auteurs analysés) ;
+    # digest : empreinte du chat, pour n'utiliser la matrice auteurs × termes (run_config.term_matrix) que si elle est à jour
+    print("\n=== Préparation de l'analyse IA ===")
+    # Configuration de l'API key Anthropic (depuis le fichier .env)
+    # ANTHROPIC_BASE_URL (lu par le client) permet de viser le faux serveur fake_anthropic.py
+    anthropic_api_key = os.getenv('ANTHROPIC_API_KEY')
+    if not anthropic_api_key or len(anthropic_api_key) <= 20:  # Clé API valide (plus de 20 caractères)
+        print("⚠️  ANTHROPIC_API_KEY non trouvée dans le fichier .env")
+        print("\n🤖 Pour lancer l'analyse IA, configurez votre API key dans le fichier .env")
+        print("Éditez .env et remplacez:")
+        print("ANTHROPIC_API_KEY=your-anthropic-api-key-here")
+        print("par votre vraie clé API Anthropic")
+        return
+    print("✅ Anthropic configuré (Claude Haiku 3.5)")
+
+    print("⚡ MODE ÉCONOMIQUE ACTIVÉ - Claude Haiku 3.5")
+    print("🔥 Analyse fun et rapide du contenu du groupe")
+    print("📊 Analyse du TOP 10 des participants avec TOUTE leur data")
+
+    # Créer le dossier de résultats IA
+    AI_RESULTS_DIR = os.path.join(run_config.figures_dir, 'analyses_ia')
+    os.makedirs(AI_RESULTS_DIR, exist_ok=True)
+
+    message_index = None
+    if retrieval_mode:
+        message_index = MessageIndex(index_dir(run_config.input_file))
+        print(f"🔎 Mode recherche : {AI_RETRIEVAL_PER_CATEGORY} messages max par catégorie et par auteur")
+
+    term_matrix = None
+    if run_config.term_matrix and matrix_is_current(matrix_dir(run_config.input_file), digest):
+        term_matrix = TermMatrix(matrix_dir(run_config.input_file))
+        print("🔤 Vocabulaire des auteurs ajouté au prompt d'agrégation (mots signature, expressions)")
+
+    def vocabularies(authors):
+        return {author: term_matrix.describe_author(author) for author in authors} if term_matrix else None
+
+    # Utiliser uniquement le modèle haiku pour les tests
+    models_to_test = [
+        {"name": "haiku", "display": "Claude Haiku 3.5", "emoji": "⚡"},
+    ]
+
+    for model_config in models_to_test:
+        model_name = model_config["name"]
+        model_display = model_config["display"]
+        model_emoji = model_config["emoji"]
+        config = model_configs.get(model_name, model_configs["haiku"])
+
+        print(f"\n{model_emoji} === ANALYSE AVEC {model_display.upper()} ===")
+
+        if TEST_GIS and not batch_mode:
+            test_author = 'Gis'
+            print(f"[MODE TEST] Analyse des 5 premiers segments de {test_author}")
+            # Messages entiers regroupés en segments remplis jusqu'au budget de tokens du modèle
+            segments = read_segments_for_ai(test_author, run_config, config['segment_tokens'], message_index)
+            if segments is None:
+                print(f"Fichier non trouvé pour {test_author}")
+                return
+            author_text = "".join(segments)
+            if len(author_text.strip()) == 0:
+                print(f"Aucun texte pour {test_author}")
+                return
+            final_result, trace = asyncio.run(analyze_authors(anthropic_api_key, {test_author: segments[:5]}, model_name,
+                                                                  vocabularies=vocabularies([test_author])))[test_author]
+            if final_result:
+                safe_author = test_author.replace(' ', '_').replace('.', '_')
+                filename = f"{safe_author}_{model_name}_ECO_analysis_TEST.txt"
+                with open(os.path.join(AI_RESULTS_DIR, filename), 'w', encoding='utf-8') as f:
+                    f.write(f"{model_emoji} === ANALYSE TEST de {test_author} ({model_display}) ===\n\n")
+                    f.write(f"📊 Données analysées: {len(author_text):,} caractères\n")
+                    f.write(f"🤖 Modèle utilisé: {model_display}\n")
+                    f.write(f"🌳 Arbre d'agrégation: {trace.depth} niveau(x), {trace.describe()}\n\n")
+                    f.write(final_result)
+            print(f"[OK] Analyse TEST terminée pour {test_author}\n")
+            return
+
+        # Analyser le TOP 5 des auteurs ayant le plus de messages (tous les auteurs en mode lot), en parallèle
+        top5_authors = stats['nb_messages'].sort_values(ascending=False).head(None if batch_mode else 5)[::-1].index
+        author_texts = {}
+        author_segments = {}
+        with span("segments"):
+            for author in top5_authors:
+                # Tous les messages de cet auteur, en segments
+                segments = read_segments_for_ai(author, run_config, config['segment_tokens'], message_index)
+                if segments is None:
+                    continue
+                author_text = "".join(segments)
+                if len(author_text.strip()) == 0:
+                    continue
+                print(f"  📝 {len(author_text)} caractères à analyser pour {author} "
+                      f"({len(segments)} segments de {config['segment_tokens']} tokens max)")
+                author_texts[author] = author_text
+                author_segments[author] = segments
+
+        print(f"🔍 Analyse COMPLÈTE de {len(author_segments)} auteurs avec {model_display}...")
+        final_results = asyncio.run(analyze_authors(anthropic_api_key, author_segments, model_name, batch_mode=batch_mode,
+                                                    vocabularies=vocabularies(author_segments)))
+
+        for author, (final_result, trace) in final_results.items():
+            # Sauvegarder les résultats avec le nom du modèle
+            if final_result:
+                safe_author = author.replace(' ', '_').replace('.', '_')
+                filename = f"{safe_author}_{model_name}_ECO_analysis.txt"
+
+                with open(os.path.join(AI_RESULTS_DIR, filename), 'w', encoding='utf-8') as f:
+                    f.write(f"{model_emoji} === ANALYSE ÉCONOMIQUE de {author} ({model_display}) ===\n\n")
+                    f.write(f"📊 Données analysées: {len(author_texts[author]):,} caractères\n")
+                    f.write(f"🤖 Modèle utilisé: {model_display}\n")
+                    f.write(f"🌳 Arbre d'agrégation: {trace.depth} niveau(x), {trace.describe()}\n\n")
+                    f.write(final_result)
+
+            print(f"[OK] Analyse terminée pour {author}")
+
+    print("✅ Analyse ÉCONOMIQUE terminée ! Résultats dans figures/analyses_ia/")
+    print("⚡ Modèle économique utilisé : Claude Haiku 3.5")
+    print("🌶️ Contenu politique, clivant et croustillant détecté en détail !")
+    print("💸 Coût minimal pour l'analyse TOP 10 !")
@@ -0,0 +1,118 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+
+import anthropic
+
+from instrumentation import record_call
+from response_cache import response_key
+
+# Codes HTTP à retenter : 429 = limite de débit dépassée, 529 = API surchargée
+RETRY_STATUS_CODES = (429, 529)
+CHARS_PER_TOKEN = 4  # Estimation grossière des tokens d'entrée avant envoi
+
+
+class TokenBucket:
+    # Seau à jetons : se remplit de per_minute jetons par minute, au plus per_minute
+    # d'avance (rafale). acquire(n) attend que n jetons soient disponibles.
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self._tokens = float(per_minute)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount=1):
+        # Une demande plus grosse que le seau entier attend seulement qu'il soit plein
+        amount = min(amount, self.capacity)
+        async with self._lock:  # Premier arrivé, premier servi
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+
+
+@dataclass
+class EngineStats:
+    calls: int = 0
+    retries: int = 0
+    errors: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+
+class AnalysisEngine:
+    # Appels concurrents à l'API Messages : limite globale d'appels en vol, débit
+    # (requêtes et tokens par minute) et retentatives avec backoff exponentiel sur 429/529.
+    # cache : ResponseCache optionnel, consulté avant tout appel
+    def __init__(self, client, max_concurrency=8, requests_per_minute=50, tokens_per_minute=50000,
+                 max_retries=5, base_delay=1.0, max_delay=60.0, cache=None):
+        self.client = client
+        self.cache = cache
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = EngineStats()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+
+    def _backoff(self, attempt, error):
+        # Délai imposé par le serveur (retry-after) s'il existe, sinon exponentiel avec gigue
+        retry_after = error.response.headers.get("retry-after") if error.response is not None else None
+        try:
+            return min(self.max_delay, float(retry_after))
+        except (TypeError, ValueError):
+            delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+            return delay * (0.5 + random.random() / 2)
+
+    async def create(self, model, max_tokens, content, cache_key=None):
+        # Un appel Messages (un seul message utilisateur) ; renvoie le texte de la réponse.
+        # cache_key : ce qui identifie le prompt (version du gabarit, texte...), sans les
+        # détails cosmétiques qui changeraient à chaque run (numéro du lot...)
+        key = None
+        if self.cache is not None and cache_key is not None:
+            key = response_key(model, max_tokens, *cache_key)
+            cached = self.cache.get(key)
+            if cached is not None:
+                record_call(model, 0.0, status="cache")
+                return cached
+        estimated_tokens = len(content) // CHARS_PER_TOKEN + max_tokens
+        for attempt in range(self.max_retries + 1):
+            await self._requests.acquire(1)
+            await self._tokens.acquire(estimated_tokens)
+            async with self._semaphore:
+                start = time.perf_counter()
+                try:
+                    self.stats.calls += 1
+                    response = await self.client.messages.create(
+                        model=model,
+                        max_tokens=max_tokens,
+                        messages=[{"role": "user", "content": content}],
+                    )
+                except anthropic.APIStatusError as e:
+                    record_call(model, time.perf_counter() - start, status=e.status_code, attempt=attempt)
+                    if e.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                        self.stats.errors += 1
+                        raise
+                    delay = self._backoff(attempt, e)
+                else:
+                    record_call(model, time.perf_counter() - start, response.usage.input_tokens,
+                                response.usage.output_tokens, attempt=attempt)
+                    self.stats.input_tokens += response.usage.input_tokens
+                    self.stats.output_tokens += response.usage.output_tokens
+                    text = response.content[0].text
+                    if key is not None:
+                        self.cache.put(key, text, response.usage.input_tokens, response.usage.output_tokens)
+                    return text
+            # Attente hors du sémaphore : les autres appels continuent pendant le backoff
+            self.stats.retries += 1
+            await asyncio.sleep(delay)
@@ -0,0 +1,120 @@
+import io
+from collections import OrderedDict
+from pathlib import Path
+
+from segmenter import pack_segments
+
+# Fichiers ouverts simultanément au maximum (les groupes peuvent avoir des centaines d'auteurs)
+MAX_OPEN_FILES = 64
+WRITE_BUFFER_SIZE = 1 << 16
+
+SINGLE_FILE_NAME = "all_messages.txt"
+SHARD_PATTERN = "shard_*.txt"
+
+
+def author_dir(output_dir, author):
+    return Path(output_dir) / author.replace(" ", "_")
+
+
+def _shard_name(index):
+    return f"shard_{index:04d}.txt"
+
+
+class AuthorFileWriter:
+    # Écrit les messages de tous les auteurs en une seule passe chronologique
+    # (un fichier all_messages.txt par auteur, découpé en segments au moment de l'analyse IA ;
+    # voir write_author_shards pour des fichiers déjà découpés)
+    def __init__(self, output_dir, mode="w", max_open_files=MAX_OPEN_FILES, buffer_size=WRITE_BUFFER_SIZE):
+        self.output_dir = Path(output_dir)
+        self.mode = mode
+        self.max_open_files = max_open_files
+        self.buffer_size = buffer_size
+        self._handles = OrderedDict()  # auteur -> fichier ouvert (ordre LRU)
+        self._started = set()          # auteurs déjà ouverts une fois pendant ce run
+
+    def __enter__(self):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        while self._handles:
+            self._handles.popitem(last=False)[1].close()
+
+    def write(self, author, line):
+        self._handle(author).write(line)
+
+    def _handle(self, author):
+        handle = self._handles.get(author)
+        if handle is not None:
+            self._handles.move_to_end(author)
+            return handle
+
+        if author not in self._started:
+            self._started.add(author)
+            directory = author_dir(self.output_dir, author)
+            directory.mkdir(parents=True, exist_ok=True)
+            if self.mode == "w":
+                _remove_author_files(directory)
+
+        if len(self._handles) >= self.max_open_files:
+            self._handles.popitem(last=False)[1].close()
+        # Toujours en ajout : le fichier a déjà été vidé à la première ouverture si mode="w"
+        handle = open(author_dir(self.output_dir, author) / SINGLE_FILE_NAME, "a", encoding="utf-8",
+                      buffering=self.buffer_size)
+        self._handles[author] = handle
+        return handle
+
+
+def _remove_author_files(directory):
+    # Réécriture complète : on retire les fichiers de l'une ou l'autre disposition
+    for stale in [directory / SINGLE_FILE_NAME, *directory.glob(SHARD_PATTERN)]:
+        stale.unlink(missing_ok=True)
+
+
+def write_author_shards(output_dir, author_lines, budget, mode="w"):
+    # Fichiers shard_XXXX.txt d'au plus budget tokens par auteur, coupés par pack_segments :
+    # chaque shard est directement un segment de l'analyse IA. En ajout (mode="a"), seul le dernier
+    # shard est réécrit, complété par les nouveaux messages (un ajout ne change que le dernier segment)
+    for author, lines in author_lines.items():
+        directory = author_dir(output_dir, author)
+        directory.mkdir(parents=True, exist_ok=True)
+        existing = sorted(directory.glob(SHARD_PATTERN)) if mode == "a" else []
+        first = 0
+        if existing:
+            first = int(existing[-1].stem.split("_")[1])
+            with open(existing[-1], encoding="utf-8", newline="") as f:
+                lines = list(f) + lines
+        else:
+            _remove_author_files(directory)
+        for index, segment in enumerate(pack_segments(lines, budget), first):
+            with open(directory / _shard_name(index), "w", encoding="utf-8", newline="") as f:
+                f.write(segment)
+
+
+def read_author_shards(output_dir, author):
+    # Shards d'un auteur, un texte par shard dans l'ordre ; None si l'auteur n'a pas de shards
+    paths = sorted(author_dir(output_dir, author).glob(SHARD_PATTERN))
+    if not paths:
+        return None
+    shards = []
+    for path in paths:
+        with open(path, encoding="utf-8", newline="") as f:
+            shards.append(f.read())
+    return shards
+
+
+def read_author_lines(output_dir, author):
+    # Messages d'un auteur, une ligne "[date heure] message\n" par message, dans l'ordre
+    # chronologique (shards mis bout à bout) ; None si l'auteur n'a aucun fichier
+    shards = read_author_shards(output_dir, author)
+    if shards is not None:
+        # Un message trop long pour un shard continue dans le suivant : on recolle avant de couper
+        return list(io.StringIO("".join(shards), newline=""))
+    path = author_dir(output_dir, author) / SINGLE_FILE_NAME
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8", newline="") as f:
+        return list(f)
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+
+from chat_cache import CACHE_DIR
+
+BATCH_MANIFEST_NAME = "ai_batches.json"
+MAX_BATCH_REQUESTS = 100_000  # Limite de l'API par lot
+POLL_INTERVAL = 60  # Secondes entre deux vérifications de l'état d'un lot
+
+
+def manifest_path(cache_dir=CACHE_DIR):
+    return Path(cache_dir) / BATCH_MANIFEST_NAME
+
+
+def load_manifest(path):
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {"batches": []}
+
+
+def save_manifest(path, manifest):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+async def _wait_for_batch(client, entry, path, manifest, poll_interval):
+    while True:
+        batch = await client.messages.batches.retrieve(entry["id"])
+        counts = batch.request_counts
+        entry["status"] = batch.processing_status
+        save_manifest(path, manifest)
+        if batch.processing_status == "ended":
+            return
+        print(f"  ⏳ Lot {entry['id']} : {counts.processing} requête(s) en cours, "
+              f"{counts.succeeded} terminée(s) (prochaine vérification dans {poll_interval}s)")
+        await asyncio.sleep(poll_interval)
+
+
+async def _collect_batch(client, entry, path, manifest, cache):
+    # Les réponses vont dans le cache des réponses, sous leur custom_id (= clé de cache)
+    succeeded = failed = 0
+    async for result in await client.messages.batches.results(entry["id"]):
+        if result.result.type == "succeeded":
+            message = result.result.message
+            cache.put(result.custom_id, message.content[0].text,
+                      message.usage.input_tokens, message.usage.output_tokens)
+            succeeded += 1
+        else:
+            failed += 1
+    entry.update(status="collected", succeeded=succeeded, failed=failed)
+    save_manifest(path, manifest)
+    print(f"  📥 Lot {entry['id']} récupéré : {succeeded} réponse(s), {failed} échec(s)")
+
+
+async def run_batches(client, requests, cache, path=None, poll_interval=POLL_INTERVAL):
+    # requests : {clé de cache: {"model", "max_tokens", "messages"}}. Soumet en lots Message Batches
+    # les requêtes absentes du cache, attend la fin des traitements et range les réponses dans le cache.
+    # Le manifeste garde les identifiants des lots : après un crash, on reprend les lots en cours
+    # au lieu de tout resoumettre.
+    path = path or manifest_path()
+    manifest = load_manifest(path)
+    for entry in manifest["batches"]:
+        if entry["status"] != "collected":
+            print(f"  🔁 Reprise du lot {entry['id']} ({entry['requests']} requêtes)")
+            await _wait_for_batch(client, entry, path, manifest, poll_interval)
+            await _collect_batch(client, entry, path, manifest, cache)
+    # Lots déjà récupérés : leurs réponses sont dans le cache, inutile de les garder
+    manifest["batches"] = []
+
+    todo = [(key, params) for key, params in requests.items() if key not in cache]
+    print(f"  📦 {len(requests) - len(todo)} requête(s) déjà en cache, {len(todo)} à soumettre en lot")
+    for start in range(0, len(todo), MAX_BATCH_REQUESTS):
+        chunk = todo[start:start + MAX_BATCH_REQUESTS]
+        batch = await client.messages.batches.create(
+            requests=[{"custom_id": key, "params": params} for key, params in chunk])
+        entry = {"id": batch.id, "status": batch.processing_status, "requests": len(chunk), "created": time.time()}
+        manifest["batches"].append(entry)
+        save_manifest(path, manifest)
+        print(f"  🚀 Lot {batch.id} soumis ({len(chunk)} requêtes)")
+
+    for entry in manifest["batches"]:
+        if entry["status"] != "collected":
+            await _wait_for_batch(client, entry, path, manifest, poll_interval)
+            await _collect_batch(client, entry, path, manifest, cache)
@@ -0,0 +1,258 @@
+# Banc de mesure du pipeline sur des exports synthétiques (synthetic_chat.py) de plusieurs tailles :
+#   python benchmark.py                                  # 10k, 1M et 10M messages → benchmark_results.json
+#   python benchmark.py --sizes 10000 100000 --output avant.json
+#   python benchmark.py --sizes 10000 100000 --output apres.json --compare avant.json
+# Chaque taille tourne dans un processus neuf (pic mémoire propre, aucun cache partagé), dans un
+# dossier de travail temporaire. Temps et pic de mémoire (RSS) sont mesurés étape par étape ;
+# l'étape IA vise un faux serveur local (fake_anthropic.py) : aucune clé, aucun coût.
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from instrumentation import current_rss
+from synthetic_chat import DATE_FORMATS, generate_chat
+
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+DATA_DIR = Path(".benchmark")  # Exports synthétiques gardés d'un run à l'autre (mêmes données à comparer)
+RESULTS_FILE = "benchmark_results.json"
+SAMPLE_SECONDS = 0.01  # Intervalle d'échantillonnage de la mémoire
+AI_AUTHORS = 5  # Auteurs analysés par l'étape IA (comme le TOP 5 de l'analyse complète)
+AI_SEGMENTS = 5  # Segments par auteur au maximum
+SEGMENT_TOKENS = 2000  # CHUNK_TOKEN_LIMIT de ai_analysis.py
+
+
+# === Mémoire : RSS échantillonné dans un thread (ru_maxrss ne donne que le pic du processus entier) ===
+class PeakMemory:
+    def __init__(self):
+        self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(SAMPLE_SECONDS):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+class StageTimer:
+    # Durée et pic de RSS de chaque étape ; la sortie des étapes est masquée sauf avec verbose
+    def __init__(self, verbose=False):
+        self.stages = {}
+        self.verbose = verbose
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        output = contextlib.nullcontext() if self.verbose else contextlib.redirect_stdout(io.StringIO())
+        start = time.perf_counter()
+        with PeakMemory() as memory, output:
+            yield
+        seconds = time.perf_counter() - start
+        self.stages[name] = {"seconds": round(seconds, 4), "peak_rss_mb": round(memory.peak / 1e6, 1)}
+        print(f"    {name:<10} {seconds:8.2f}s   pic {memory.peak / 1e6:8.1f} Mo", flush=True)
+
+
+def export_path(options, n_messages):
+    name = f"chat_{n_messages}_{options.authors}a_{options.date_format}_s{options.seed}.txt"
+    return (DATA_DIR / name).resolve()
+
+
+# === Un run complet pour une taille (dans le processus enfant) ===
+def run_size(options, n_messages):
+    from author_files import read_author_lines
+    from chat_parser import parse_chat_file
+    from message_index import build_index
+    from pipeline import ChatData, RunConfig, compute_stats, enrich_dataframe, figure_jobs, write_author_files
+    from segmenter import pack_segments
+    from term_matrix import build_term_matrix
+
+    timer = StageTimer(options.verbose)
+    path = export_path(options, n_messages)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with timer.stage("generate"):
+            generate_chat(path, n_messages, options.authors, options.multiline, options.media, options.emoji,
+                          options.date_format, options.seed)
+
+    ai_calls = None
+    with tempfile.TemporaryDirectory(prefix="godvoice_bench_") as work_dir:
+        # Caches (.godvoice_cache), by_authors/ et figures/ écrits dans le dossier temporaire
+        os.chdir(work_dir)
+        config = RunConfig(input_file=str(path), workers=options.workers, message_index=False, term_matrix=False)
+
+        with timer.stage("parse"):
+            chat = parse_chat_file(config.input_file, workers=config.workers)
+        with timer.stage("enrich"):
+            df = chat.to_dataframe()
+            del chat
+            enrich_dataframe(df)
+        with timer.stage("split"):
+            write_author_files(df, config)
+        with timer.stage("stats"):
+            chat_stats = compute_stats(ChatData(df), config)
+        with timer.stage("index"):
+            authors = df['author'].cat
+            build_index(Path(work_dir) / "index", authors.categories, authors.codes.to_numpy(),
+                        df['timestamp'].to_numpy(), df['message'])
+        with timer.stage("terms"):
+            build_term_matrix(Path(work_dir) / "terms", authors.categories, authors.codes.to_numpy(), df['message'],
+                              workers=config.workers)
+        del authors, df
+
+        if not options.no_figures:
+            from figures import render_figures
+            # Figures globales et heatmaps par auteur mesurées à part : les secondes grossissent avec les auteurs
+            jobs = figure_jobs(chat_stats, config)
+            heatmap_jobs = [job for job in jobs if os.path.basename(os.path.dirname(job.path)) == 'heatmaps_par_auteur']
+            global_jobs = [job for job in jobs if job not in heatmap_jobs]
+            for name, group in (("figures", global_jobs), ("heatmaps", heatmap_jobs)):
+                with timer.stage(name):
+                    for directory in {os.path.dirname(job.path) for job in group}:
+                        os.makedirs(directory, exist_ok=True)
+                    render_figures(group, config.workers, force=True)
+
+        top_authors = chat_stats.stats['nb_messages'].sort_values(ascending=False).head(AI_AUTHORS).index
+        with timer.stage("segments"):
+            author_segments = {author: pack_segments(read_author_lines(config.output_dir, author) or [],
+                                                     SEGMENT_TOKENS)[:AI_SEGMENTS]
+                               for author in top_authors}
+        if not options.no_ai:
+            ai_calls = run_ai_stage(timer, author_segments, options.ai_latency)
+        os.chdir(options.cwd)
+
+    measured = {name: stage for name, stage in timer.stages.items() if name != "generate"}
+    return {
+        "messages": n_messages,
+        "file_mb": round(path.stat().st_size / 1e6, 1),
+        "stages": timer.stages,
+        "total_seconds": round(sum(stage["seconds"] for stage in measured.values()), 4),
+        "peak_rss_mb": max(stage["peak_rss_mb"] for stage in measured.values()),
+        "ai_calls": ai_calls,
+    }
+
+
+def run_ai_stage(timer, author_segments, latency):
+    import asyncio
+
+    import ai_analysis
+    from fake_anthropic import FakeAnthropicServer
+
+    # Limites de débit hors d'atteinte : on mesure le pipeline, pas l'attente du seau à jetons
+    ai_analysis.AI_REQUESTS_PER_MINUTE = ai_analysis.AI_TOKENS_PER_MINUTE = 10 ** 9
+    with FakeAnthropicServer(latency=latency) as server:
+        os.environ["ANTHROPIC_BASE_URL"] = server.base_url
+        with timer.stage("ai"):
+            asyncio.run(ai_analysis.analyze_authors("fake-key-pour-les-benchmarks", author_segments, "haiku"))
+        return server.requests
+
+
+# === Lancement et comparaison ===
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_in_child(argv, n_messages):
+    # Processus neuf par taille : le pic mémoire d'une taille ne pollue pas la suivante
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        result_path = f.name
+    try:
+        subprocess.run([sys.executable, __file__, *argv, "--child", str(n_messages), "--child-result", result_path],
+                       check=True)
+        return json.loads(Path(result_path).read_text(encoding="utf-8"))
+    except subprocess.CalledProcessError as exc:
+        print(f"  ❌ {n_messages:,} messages : échec ({exc})")
+        return {"messages": n_messages, "error": str(exc)}
+    finally:
+        os.unlink(result_path)
+
+
+def compare(results, previous):
+    # Ratio nouveau / ancien par étape, pour chaque taille présente dans les deux fichiers
+    old_runs = {run["messages"]: run for run in previous["runs"] if "stages" in run}
+    print(f"\n=== Comparaison avec {previous['meta'].get('commit') or '?'} ({previous['meta'].get('date', '?')}) ===")
+    for run in results["runs"]:
+        old = old_runs.get(run["messages"])
+        if old is None or "stages" not in run:
+            continue
+        print(f"  {run['messages']:,} messages")
+        for name, stage in run["stages"].items():
+            old_stage = old["stages"].get(name)
+            if old_stage is None or name == "generate":
+                continue
+            ratio = stage["seconds"] / old_stage["seconds"] if old_stage["seconds"] else float("nan")
+            print(f"    {name:<10} {old_stage['seconds']:8.2f}s → {stage['seconds']:8.2f}s  (x{ratio:.2f})   "
+                  f"pic {old_stage['peak_rss_mb']:8.1f} → {stage['peak_rss_mb']:8.1f} Mo")
+        print(f"    {'total':<10} {old['total_seconds']:8.2f}s → {run['total_seconds']:8.2f}s   "
+              f"pic {old['peak_rss_mb']:8.1f} → {run['peak_rss_mb']:8.1f} Mo")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mesure du pipeline sur des exports WhatsApp synthétiques")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Nombres de messages")
+    parser.add_argument('--authors', type=int, default=12)
+    parser.add_argument('--multiline', type=float, default=0.05)
+    parser.add_argument('--media', type=float, default=0.08)
+    parser.add_argument('--emoji', type=float, default=0.3)
+    parser.add_argument('--date-format', choices=sorted(DATE_FORMATS), default='android')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--ai-latency', type=float, default=0.05, help="Latence simulée de chaque appel IA (s)")
+    parser.add_argument('--no-figures', action='store_true')
+    parser.add_argument('--no-ai', action='store_true')
+    parser.add_argument('--verbose', action='store_true', help="Afficher la sortie normale des étapes")
+    parser.add_argument('--output', default=RESULTS_FILE)
+    parser.add_argument('--compare', metavar='ANCIEN.json', help="Résultats d'une version précédente")
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--child-result', help=argparse.SUPPRESS)
+    options = parser.parse_args()
+    options.cwd = os.getcwd()
+
+    if options.child:
+        result = run_size(options, options.child)
+        Path(options.child_result).write_text(json.dumps(result), encoding="utf-8")
+        sys.exit(0)
+
+    # Options transmises telles quelles aux processus enfants
+    child_argv = sys.argv[1:]
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "options": {key: value for key, value in vars(options).items()
+                        if key not in ("child", "child_result", "cwd", "output", "compare", "verbose")},
+        },
+        "runs": [],
+    }
+    for n_messages in options.sizes:
+        print(f"\n=== {n_messages:,} messages ===", flush=True)
+        results["runs"].append(run_in_child(child_argv, n_messages))
+        # Écrit après chaque taille : un run de 10M interrompu garde les tailles déjà mesurées
+        Path(options.output).write_text(json.dumps(results, indent=1, ensure_ascii=False), encoding="utf-8")
+    print(f"\n✅ Résultats dans {options.output}")
+
+    if options.compare:
+        compare(results, json.loads(Path(options.compare).read_text(encoding="utf-8")))
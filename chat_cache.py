@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from chat_parser import NAT, PARSER_VERSION
+
+# Cache du DataFrame enrichi (format Feather/Arrow : colonnes catégorielles conservées)
+CACHE_DIR = ".godvoice_cache"
+
+try:
+    import pyarrow  # noqa: F401  (requis par pandas pour Feather)
+    HAS_PYARROW = True
+except ImportError:
+    print("⚠️  pyarrow non installé : cache du chat désactivé. Installez avec: pip install pyarrow")
+    HAS_PYARROW = False
+
+
+def file_digest(path, limit=None, block_size=1 << 20):
+    # Empreinte du fichier, ou de ses `limit` premiers octets
+    digest = hashlib.blake2b(digest_size=20)
+    remaining = os.path.getsize(path) if limit is None else limit
+    with open(path, "rb") as f:
+        while remaining > 0:
+            block = f.read(min(block_size, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+def cache_path(input_file, suffix, cache_dir=CACHE_DIR):
+    # Un jeu de fichiers de cache par fichier d'entrée (plusieurs exports peuvent partager le dossier)
+    source = os.path.abspath(input_file)
+    name = f"{Path(source).stem}-{hashlib.blake2b(source.encode(), digest_size=6).hexdigest()}"
+    return Path(cache_dir) / f"{name}{suffix}"
+
+
+def load_cache_meta(input_file, features_version, cache_dir=CACHE_DIR):
+    # Métadonnées du dernier run, si elles correspondent aux versions actuelles du code
+    meta_path = cache_path(input_file, ".json", cache_dir)
+    if not HAS_PYARROW or not meta_path.exists() or not cache_path(input_file, ".feather", cache_dir).exists():
+        return None
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    if meta.get("parser_version") != PARSER_VERSION or meta.get("features_version") != features_version:
+        return None
+    return meta
+
+
+def current_cache_meta(input_file, features_version, cache_dir=CACHE_DIR):
+    # Métadonnées du cache si chat.txt n'a pas changé depuis le dernier run, sinon None
+    meta = load_cache_meta(input_file, features_version, cache_dir)
+    if meta is None:
+        return None
+    stat = os.stat(input_file)
+    if meta["size"] != stat.st_size:
+        return None
+    if meta["mtime_ns"] != stat.st_mtime_ns:
+        # Fichier touché (copie, nouvel export identique...) : on vérifie le contenu
+        if meta["digest"] != file_digest(input_file):
+            return None
+        meta["mtime_ns"] = stat.st_mtime_ns
+        cache_path(input_file, ".json", cache_dir).write_text(json.dumps(meta), encoding="utf-8")
+    return meta
+
+
+def load_cached_chat(input_file, features_version, cache_dir=CACHE_DIR, verify_source=True):
+    # Renvoie le DataFrame enrichi si chat.txt n'a pas changé, sinon None.
+    # verify_source=False recharge le dernier état connu même si le fichier a grandi
+    if verify_source:
+        meta = current_cache_meta(input_file, features_version, cache_dir)
+    else:
+        meta = load_cache_meta(input_file, features_version, cache_dir)
+    if meta is None:
+        return None
+
+    import pandas as pd
+    df = pd.read_feather(cache_path(input_file, ".feather", cache_dir))
+    df.attrs['date_order'] = meta.get("date_order")
+    return df
+
+
+def appended_offset(input_file, features_version, cache_dir=CACHE_DIR):
+    # Octet à partir duquel reprendre le parse si chat.txt n'a fait que grandir
+    # depuis le dernier run (le début du fichier doit être identique octet pour octet)
+    meta = load_cache_meta(input_file, features_version, cache_dir)
+    if meta is None or os.path.getsize(input_file) <= meta["size"]:
+        return None
+    if file_digest(input_file, limit=meta["size"]) != meta["digest"]:
+        return None
+    return meta["size"]
+
+
+def save_cached_chat(input_file, features_version, df, cache_dir=CACHE_DIR):
+    # Renvoie l'empreinte du fichier mis en cache (None si le cache est désactivé)
+    if not HAS_PYARROW:
+        return None
+    data_path, meta_path = cache_path(input_file, ".feather", cache_dir), cache_path(input_file, ".json", cache_dir)
+    data_path.parent.mkdir(parents=True, exist_ok=True)
+
+    stat = os.stat(input_file)
+    timestamps = df['timestamp'][df['timestamp'] != NAT]
+    previous_meta = load_cache_meta(input_file, features_version, cache_dir)
+    meta = {
+        "input_file": os.path.abspath(input_file),
+        # Taille = octet de reprise du mode incrémental
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "digest": file_digest(input_file),
+        "last_timestamp": int(timestamps.max()) if len(timestamps) else NAT,
+        "parser_version": PARSER_VERSION,
+        "features_version": features_version,
+        # Ordre jour/mois des dates détecté au parse, réutilisé pour les messages ajoutés
+        "date_order": df.attrs.get("date_order"),
+        # Empreinte du chat pour laquelle chaque dossier by_authors/ a été écrit (voir author_files_digest)
+        "author_files": previous_meta.get("author_files", {}) if previous_meta else {},
+    }
+    # Écriture atomique : un run interrompu ne laisse jamais un cache à moitié écrit
+    meta_path.unlink(missing_ok=True)
+    tmp_path = data_path.with_suffix(".tmp")
+    df.to_feather(tmp_path)
+    os.replace(tmp_path, data_path)
+    meta_path.write_text(json.dumps(meta), encoding="utf-8")
+    return meta["digest"]
+
+
+def author_files_digest(input_file, features_version, output_dir, cache_dir=CACHE_DIR):
+    # Empreinte du chat au moment de la dernière écriture des fichiers par auteur dans output_dir
+    # (None si jamais écrits) : le cache du chat peut avoir absorbé des ajouts sans eux (parse, stats)
+    meta = load_cache_meta(input_file, features_version, cache_dir)
+    return meta.get("author_files", {}).get(os.path.abspath(output_dir)) if meta else None
+
+
+def save_author_files_digest(input_file, features_version, output_dir, digest, cache_dir=CACHE_DIR):
+    meta = load_cache_meta(input_file, features_version, cache_dir)
+    if meta is None or digest is None:
+        return
+    meta.setdefault("author_files", {})[os.path.abspath(output_dir)] = digest
+    cache_path(input_file, ".json", cache_dir).write_text(json.dumps(meta), encoding="utf-8")
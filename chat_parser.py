@@ -0,0 +1,309 @@
+import functools
+import io
+import mmap
+import multiprocessing
+import os
+import re
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+
+# Version du parser : à incrémenter dès que les colonnes produites changent
+PARSER_VERSION = 2
+
+# Timestamp sentinelle pour les dates invalides (même valeur entière que pd.NaT)
+NAT = np.iinfo(np.int64).min
+
+# Regex pour détecter début de message WhatsApp, quelle que soit la langue de l'export :
+#   Android : 8/22/23, 18:26 - Auteur: message   (ou 22.08.2023, 6:26 PM - ...)
+#   iOS     : [22/08/2023, 18:26:05] Auteur: message
+pattern = re.compile(
+    r'^\u200e?\[?(\d{1,4}[/.\-]\d{1,2}[/.\-]\d{2,4}),? '
+    r'(\d{1,2}:\d{2}(?::\d{2})?(?:\s?[AaPp]\.?\s?[Mm]\.?)?)(?:\]| -) ([^:]+): (.+)'
+)
+
+# Ordre jour/mois/année des dates ; détecté sur les dates de l'export, "mdy" si rien ne permet de trancher
+DATE_ORDERS = {'mdy': (2, 0, 1), 'dmy': (2, 1, 0), 'ymd': (0, 1, 2)}  # positions de (année, mois, jour)
+DEFAULT_DATE_ORDER = 'mdy'
+DATE_SEPARATORS = re.compile(r'[/.\-]')
+TIME_REGEX = re.compile(r'(\d{1,2}):(\d{2})(?::(\d{2}))?\s*(?:([AaPp])\.?\s*[Mm]\.?)?$')
+EPOCH = date(1970, 1, 1)
+
+# En dessous de cette taille, le démarrage du pool coûte plus que le parse série
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+# Nombre de plages par worker (équilibre la charge si certaines plages sont plus lentes)
+CHUNKS_PER_WORKER = 4
+
+
+@dataclass
+class ParsedChat:
+    # Colonnes du chat parsé : un élément par message, les chaînes répétitives
+    # (auteurs, dates, heures) sont stockées une seule fois et référencées par code
+    authors: list
+    author_codes: np.ndarray
+    dates: list
+    date_codes: np.ndarray
+    times: list
+    time_codes: np.ndarray
+    timestamps: np.ndarray
+    # Tous les messages bout à bout : message i = text[offsets[i]:offsets[i + 1]]
+    text: str
+    offsets: np.ndarray
+    date_order: str = DEFAULT_DATE_ORDER
+
+    def __len__(self):
+        return len(self.author_codes)
+
+    def message(self, i):
+        return self.text[self.offsets[i]:self.offsets[i + 1]]
+
+    def messages(self):
+        text = self.text
+        bounds = self.offsets.tolist()
+        return [text[start:end] for start, end in zip(bounds, bounds[1:])]
+
+    def to_dataframe(self):
+        import pandas as pd
+
+        authors = pd.Categorical.from_codes(self.author_codes, categories=self.authors)
+        df = pd.DataFrame({
+            # Catégories triées : mêmes ordres de groupby que l'ancien DataFrame de chaînes
+            'author': authors.reorder_categories(sorted(self.authors)),
+            'date': pd.Categorical.from_codes(self.date_codes, categories=self.dates),
+            'time': pd.Categorical.from_codes(self.time_codes, categories=self.times),
+            'timestamp': self.timestamps,
+            'message': self.messages(),
+        })
+        # Gardé avec le cache : le mode incrémental reparse la fin du fichier avec le même ordre
+        df.attrs['date_order'] = self.date_order
+        return df
+
+
+# === Conversion des chaînes uniques en secondes epoch (une fois par date ou heure distincte) ===
+def parse_dates(dates, order):
+    year_pos, month_pos, day_pos = DATE_ORDERS[order]
+    parsed = np.full(len(dates), NAT, dtype=np.int64)
+    for i, value in enumerate(dates):
+        fields = DATE_SEPARATORS.split(value)
+        try:
+            year, month, day = int(fields[year_pos]), int(fields[month_pos]), int(fields[day_pos])
+            if year < 100:
+                # Même pivot que strptime('%y') : 69-99 -> 19xx, 00-68 -> 20xx
+                year += 1900 if year >= 69 else 2000
+            parsed[i] = (date(year, month, day) - EPOCH).days * 86400
+        except (ValueError, IndexError):
+            pass
+    return parsed
+
+
+def parse_times(times):
+    # Secondes depuis minuit : 24h ou 12h (AM/PM, a.m./p.m.), secondes optionnelles
+    parsed = np.full(len(times), NAT, dtype=np.int64)
+    for i, value in enumerate(times):
+        match = TIME_REGEX.match(value)
+        if match is None:
+            continue
+        hour, minute, second = int(match[1]), int(match[2]), int(match[3] or 0)
+        if match[4]:
+            if not 1 <= hour <= 12:
+                continue
+            hour = hour % 12 + (12 if match[4] in 'Pp' else 0)
+        if hour < 24 and minute < 60 and second < 60:
+            parsed[i] = hour * 3600 + minute * 60 + second
+    return parsed
+
+
+def detect_date_order(dates):
+    # dates : chaînes uniques dans leur ordre d'apparition (donc chronologique)
+    fields = [DATE_SEPARATORS.split(value) for value in dates]
+    if any(len(parts[0]) == 4 for parts in fields):
+        return 'ymd'
+    if any(int(parts[0]) > 12 for parts in fields):
+        return 'dmy'
+    if any(int(parts[1]) > 12 for parts in fields):
+        return 'mdy'
+
+    # Aucun jour > 12 : on garde l'ordre qui donne des dates valides et croissantes
+    def disorder(order):
+        days = parse_dates(dates, order)
+        valid = days[days != NAT]
+        return (len(days) - len(valid)) + int(np.count_nonzero(np.diff(valid) < 0))
+
+    return min((DEFAULT_DATE_ORDER, 'dmy'), key=disorder)
+
+
+def _build_timestamps(dates, date_codes, times, time_codes, date_order):
+    day = parse_dates(dates, date_order)[date_codes]
+    seconds = parse_times(times)[time_codes]
+    timestamps = day + np.where(seconds == NAT, 0, seconds)
+    timestamps[(day == NAT) | (seconds == NAT)] = NAT
+    return timestamps
+
+
+# === Boucle de parsing : une seule passe, les lignes de continuation sont
+# accumulées dans une liste et jointes une seule fois (coût linéaire) ===
+def parse_lines(lines, date_order=None, build_timestamps=True):
+    # build_timestamps=False : codes et texte seulement (timestamps None), pour les plages du parse
+    # parallèle : merge_parsed construit les timestamps une seule fois, sur tout le fichier
+    author_index, date_index, time_index = {}, {}, {}
+    author_codes, date_codes, time_codes = array('i'), array('i'), array('i')
+    messages = []
+    parts = None
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        match = pattern.match(line)
+        if match:
+            date, time, author, message = match.groups()
+            if parts is not None:
+                messages.append(" ".join(parts) if len(parts) > 1 else parts[0])
+            parts = [message]
+            author_codes.append(author_index.setdefault(author, len(author_index)))
+            date_codes.append(date_index.setdefault(date, len(date_index)))
+            time_codes.append(time_index.setdefault(time, len(time_index)))
+        elif parts is not None:
+            # Ajoute la ligne au dernier message
+            parts.append(line)
+
+    if parts is not None:
+        messages.append(" ".join(parts) if len(parts) > 1 else parts[0])
+
+    offsets = np.zeros(len(messages) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, messages), dtype=np.int64, count=len(messages)), out=offsets[1:])
+
+    dates, times = list(date_index), list(time_index)
+    date_codes = np.frombuffer(date_codes, dtype=np.int32)
+    time_codes = np.frombuffer(time_codes, dtype=np.int32)
+    timestamps = None
+    if build_timestamps:
+        date_order = date_order or detect_date_order(dates)
+        timestamps = _build_timestamps(dates, date_codes, times, time_codes, date_order)
+    return ParsedChat(
+        authors=list(author_index),
+        author_codes=np.frombuffer(author_codes, dtype=np.int32),
+        dates=dates,
+        date_codes=date_codes,
+        times=times,
+        time_codes=time_codes,
+        timestamps=timestamps,
+        text="".join(messages),
+        offsets=offsets,
+        date_order=date_order or DEFAULT_DATE_ORDER,
+    )
+
+
+# === Parse parallèle : plages d'octets alignées sur des débuts de message ===
+def _is_header(line):
+    return pattern.match(line.decode("utf-8", errors="replace").strip()) is not None
+
+
+def _next_message_start(buf, pos):
+    # Premier début de ligne >= pos qui est un en-tête "date, heure - auteur:"
+    size = len(buf)
+    if pos > 0:
+        newline = buf.find(b"\n", pos - 1)
+        if newline == -1:
+            return size
+        pos = newline + 1
+    while pos < size:
+        end = buf.find(b"\n", pos)
+        if end == -1:
+            end = size
+        if _is_header(buf[pos:end]):
+            return pos
+        pos = end + 1
+    return size
+
+
+def split_byte_ranges(buf, n_chunks):
+    size = len(buf)
+    bounds = [0]
+    for k in range(1, n_chunks):
+        start = _next_message_start(buf, max(size * k // n_chunks, bounds[-1] + 1))
+        if start >= size:
+            break
+        bounds.append(start)
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _parse_range(path, start, end, date_order=None, build_timestamps=True):
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        data = buf[start:end]
+    # Même décodage et même découpage des lignes que open(path, "r", encoding="utf-8")
+    return parse_lines(io.TextIOWrapper(io.BytesIO(data), encoding="utf-8"), date_order, build_timestamps)
+
+
+def parse_chat_range(path, start, end=None, date_order=None):
+    # Parse des octets [start, end) ; None si la plage ne commence pas par un
+    # en-tête de message (ex : suite d'un message déjà parsé).
+    # date_order : celui du début du fichier, pour ne pas le redétecter sur quelques dates
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        end = len(buf) if end is None else end
+        if buf[start:min(_next_message_start(buf, start), end)].strip():
+            return None
+    return _parse_range(path, start, end, date_order)
+
+
+def _remap(values, index):
+    return np.array([index.setdefault(value, len(index)) for value in values], dtype=np.int32)
+
+
+def merge_parsed(parts, date_order=None):
+    # Fusion dans l'ordre des plages : les tables uniques gardent l'ordre
+    # de première apparition, comme avec le parse série. Les timestamps sont
+    # calculés ici avec un ordre des dates détecté sur tout le fichier, pas par plage
+    author_index, date_index, time_index = {}, {}, {}
+    author_codes, date_codes, time_codes, offsets = [], [], [], []
+    shift = 0
+    for part in parts:
+        author_codes.append(_remap(part.authors, author_index)[part.author_codes])
+        date_codes.append(_remap(part.dates, date_index)[part.date_codes])
+        time_codes.append(_remap(part.times, time_index)[part.time_codes])
+        offsets.append(part.offsets[:-1] + shift)
+        shift += int(part.offsets[-1])
+    offsets.append(np.array([shift], dtype=np.int64))
+    dates, times = list(date_index), list(time_index)
+    date_codes, time_codes = np.concatenate(date_codes), np.concatenate(time_codes)
+    date_order = date_order or detect_date_order(dates)
+    return ParsedChat(
+        authors=list(author_index),
+        author_codes=np.concatenate(author_codes),
+        dates=dates,
+        date_codes=date_codes,
+        times=times,
+        time_codes=time_codes,
+        timestamps=_build_timestamps(dates, date_codes, times, time_codes, date_order),
+        text="".join(part.text for part in parts),
+        offsets=np.concatenate(offsets),
+        date_order=date_order,
+    )
+
+
+def pool_context():
+    # main.py s'exécute à l'import : spawn/forkserver le ré-exécuteraient dans chaque worker
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+
+def parse_chat_parallel(path, workers, date_order=None):
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        ranges = split_byte_ranges(buf, workers * CHUNKS_PER_WORKER)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as pool:
+        # Les workers ne renvoient que codes et texte : merge_parsed construit les timestamps une seule fois
+        parts = list(pool.map(functools.partial(_parse_range, build_timestamps=False), [path] * len(ranges), *zip(*ranges)))
+    return merge_parsed(parts, date_order)
+
+
+def parse_chat_file(path, workers=1, date_order=None):
+    if workers > 1 and pool_context() is not None and os.path.getsize(path) >= PARALLEL_MIN_BYTES:
+        return parse_chat_parallel(path, workers, date_order)
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_lines(f, date_order)
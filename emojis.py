@@ -0,0 +1,217 @@
+import functools
+
+import numpy as np
+import pandas as pd
+
+# === Moteur emoji par plages de code points ===
+# Caractères affichés en emoji par défaut (Emoji_Presentation d'emoji-data, sans les indicateurs
+# régionaux, qui ne comptent que par paires)
+_PICTOGRAPH_RANGES = [
+    (0x231A, 0x231B), (0x23E9, 0x23EC), (0x23F0, 0x23F0), (0x23F3, 0x23F3), (0x25FD, 0x25FE),
+    (0x2614, 0x2615), (0x2648, 0x2653), (0x267F, 0x267F), (0x2693, 0x2693), (0x26A1, 0x26A1),
+    (0x26AA, 0x26AB), (0x26BD, 0x26BE), (0x26C4, 0x26C5), (0x26CE, 0x26CE), (0x26D4, 0x26D4),
+    (0x26EA, 0x26EA), (0x26F2, 0x26F3), (0x26F5, 0x26F5), (0x26FA, 0x26FA), (0x26FD, 0x26FD),
+    (0x2705, 0x2705), (0x270A, 0x270B), (0x2728, 0x2728), (0x274C, 0x274C), (0x274E, 0x274E),
+    (0x2753, 0x2755), (0x2757, 0x2757), (0x2795, 0x2797), (0x27B0, 0x27B0), (0x27BF, 0x27BF),
+    (0x2B1B, 0x2B1C), (0x2B50, 0x2B50), (0x2B55, 0x2B55), (0x1F004, 0x1F004), (0x1F0CF, 0x1F0CF),
+    (0x1F18E, 0x1F18E), (0x1F191, 0x1F19A), (0x1F201, 0x1F201), (0x1F21A, 0x1F21A), (0x1F22F, 0x1F22F),
+    (0x1F232, 0x1F236), (0x1F238, 0x1F23A), (0x1F250, 0x1F251), (0x1F300, 0x1F320), (0x1F32D, 0x1F335),
+    (0x1F337, 0x1F37C), (0x1F37E, 0x1F393), (0x1F3A0, 0x1F3CA), (0x1F3CF, 0x1F3D3), (0x1F3E0, 0x1F3F0),
+    (0x1F3F4, 0x1F3F4), (0x1F3F8, 0x1F43E), (0x1F440, 0x1F440), (0x1F442, 0x1F4FC), (0x1F4FF, 0x1F53D),
+    (0x1F54B, 0x1F54E), (0x1F550, 0x1F567), (0x1F57A, 0x1F57A), (0x1F595, 0x1F596), (0x1F5A4, 0x1F5A4),
+    (0x1F5FB, 0x1F64F), (0x1F680, 0x1F6C5), (0x1F6CC, 0x1F6CC), (0x1F6D0, 0x1F6D2), (0x1F6D5, 0x1F6D9),
+    (0x1F6DC, 0x1F6DF), (0x1F6EB, 0x1F6EC), (0x1F6F4, 0x1F6FC), (0x1F7E0, 0x1F7EB), (0x1F7F0, 0x1F7F0),
+    (0x1F90C, 0x1F93A), (0x1F93C, 0x1F945), (0x1F947, 0x1F9FF), (0x1FA70, 0x1FA7C), (0x1FA80, 0x1FAC6),
+    (0x1FAC8, 0x1FAC8), (0x1FACC, 0x1FADD), (0x1FADF, 0x1FAEB), (0x1FAEF, 0x1FAFA),
+]
+# Caractères texte par défaut (Emoji sans Emoji_Presentation ni Emoji_Component : ☀ ❤ ✔ ♥ ©...),
+# qui ne sont des emojis qu'avec le sélecteur de variante U+FE0F
+_TEXT_DEFAULT_RANGES = [
+    (0x00A9, 0x00A9), (0x00AE, 0x00AE), (0x203C, 0x203C), (0x2049, 0x2049), (0x2122, 0x2122),
+    (0x2139, 0x2139), (0x2194, 0x2199), (0x21A9, 0x21AA), (0x2328, 0x2328), (0x23CF, 0x23CF),
+    (0x23ED, 0x23EF), (0x23F1, 0x23F2), (0x23F8, 0x23FA), (0x24C2, 0x24C2), (0x25AA, 0x25AB),
+    (0x25B6, 0x25B6), (0x25C0, 0x25C0), (0x25FB, 0x25FC), (0x2600, 0x2604), (0x260E, 0x260E),
+    (0x2611, 0x2611), (0x2618, 0x2618), (0x261D, 0x261D), (0x2620, 0x2620), (0x2622, 0x2623),
+    (0x2626, 0x2626), (0x262A, 0x262A), (0x262E, 0x262F), (0x2638, 0x263A), (0x2640, 0x2640),
+    (0x2642, 0x2642), (0x265F, 0x2660), (0x2663, 0x2663), (0x2665, 0x2666), (0x2668, 0x2668),
+    (0x267B, 0x267B), (0x267E, 0x267E), (0x2692, 0x2692), (0x2694, 0x2697), (0x2699, 0x2699),
+    (0x269B, 0x269C), (0x26A0, 0x26A0), (0x26A7, 0x26A7), (0x26B0, 0x26B1), (0x26C8, 0x26C8),
+    (0x26CF, 0x26CF), (0x26D1, 0x26D1), (0x26D3, 0x26D3), (0x26E9, 0x26E9), (0x26F0, 0x26F1),
+    (0x26F4, 0x26F4), (0x26F7, 0x26F9), (0x2702, 0x2702), (0x2708, 0x2709), (0x270C, 0x270D),
+    (0x270F, 0x270F), (0x2712, 0x2712), (0x2714, 0x2714), (0x2716, 0x2716), (0x271D, 0x271D),
+    (0x2721, 0x2721), (0x2733, 0x2734), (0x2744, 0x2744), (0x2747, 0x2747), (0x2763, 0x2764),
+    (0x27A1, 0x27A1), (0x2934, 0x2935), (0x2B05, 0x2B07), (0x3030, 0x3030), (0x303D, 0x303D),
+    (0x3297, 0x3297), (0x3299, 0x3299), (0x1F170, 0x1F171), (0x1F17E, 0x1F17F), (0x1F202, 0x1F202),
+    (0x1F237, 0x1F237), (0x1F321, 0x1F321), (0x1F324, 0x1F32C), (0x1F336, 0x1F336), (0x1F37D, 0x1F37D),
+    (0x1F396, 0x1F397), (0x1F399, 0x1F39B), (0x1F39E, 0x1F39F), (0x1F3CB, 0x1F3CE), (0x1F3D4, 0x1F3DF),
+    (0x1F3F3, 0x1F3F3), (0x1F3F5, 0x1F3F5), (0x1F3F7, 0x1F3F7), (0x1F43F, 0x1F43F), (0x1F441, 0x1F441),
+    (0x1F4FD, 0x1F4FD), (0x1F549, 0x1F54A), (0x1F56F, 0x1F570), (0x1F573, 0x1F579), (0x1F587, 0x1F587),
+    (0x1F58A, 0x1F58D), (0x1F590, 0x1F590), (0x1F5A5, 0x1F5A5), (0x1F5A8, 0x1F5A8), (0x1F5B1, 0x1F5B2),
+    (0x1F5BC, 0x1F5BC), (0x1F5C2, 0x1F5C4), (0x1F5D1, 0x1F5D3), (0x1F5DC, 0x1F5DE), (0x1F5E1, 0x1F5E1),
+    (0x1F5E3, 0x1F5E3), (0x1F5E8, 0x1F5E8), (0x1F5EF, 0x1F5EF), (0x1F5F3, 0x1F5F3), (0x1F5FA, 0x1F5FA),
+    (0x1F6CB, 0x1F6CB), (0x1F6CD, 0x1F6CF), (0x1F6E0, 0x1F6E5), (0x1F6E9, 0x1F6E9), (0x1F6F0, 0x1F6F0),
+    (0x1F6F3, 0x1F6F3),
+]
+_SKIN_TONE_RANGE = (0x1F3FB, 0x1F3FF)
+_REGIONAL_INDICATOR_RANGE = (0x1F1E6, 0x1F1FF)
+_TAG_RANGE = (0xE0020, 0xE007F)
+_VARIATION_SELECTOR, _ZWJ, _KEYCAP = 0xFE0F, 0x200D, 0x20E3
+
+
+def _char_class(ranges):
+    return "".join(chr(a) if a == b else f"{chr(a)}-{chr(b)}" for a, b in ranges)
+
+
+_PICTOGRAPHS = _char_class(_PICTOGRAPH_RANGES)
+_TEXT_DEFAULT = _char_class(_TEXT_DEFAULT_RANGES)
+_SKIN_TONE = f"[{_char_class([_SKIN_TONE_RANGE])}]"
+_ELEMENT = f"(?:[{_PICTOGRAPHS}]\uFE0F?|[{_TEXT_DEFAULT}]\uFE0F){_SKIN_TONE}?"
+
+# Un emoji = drapeau (2 indicateurs régionaux), touche (chiffre + U+20E3) ou séquence
+# d'éléments reliés par U+200D (familles, métiers...), avec tons de peau et tags (drapeau écossais...)
+EMOJI_REGEX = (
+    f"[{_char_class([_REGIONAL_INDICATOR_RANGE])}]{{2}}"
+    "|[0-9#*]\uFE0F?\u20E3"
+    f"|{_ELEMENT}(?:\u200D{_ELEMENT})*[{_char_class([_TAG_RANGE])}]*"
+)
+# Pré-filtre en une seule classe de caractères : la plupart des messages n'ont aucun emoji
+_CANDIDATE_REGEX = f"[{_PICTOGRAPHS}{_TEXT_DEFAULT}{_char_class([_REGIONAL_INDICATOR_RANGE])}\u20E3]"
+
+
+# === Scan des octets UTF-8 (chaînes Arrow) ===
+# Tout emoji contient un caractère codé sur 3 ou 4 octets d'au moins U+2000 (premier octet >= 0xE2) :
+# pictogramme, U+FE0F (obligatoire après un caractère texte), U+20E3 (touches) ou indicateur régional.
+# On décode seulement ces caractères-là, directement dans le buffer Arrow. Un message dont les
+# emojis sont tous isolés (😀, 👍🏽, 🇫🇷, ou caractère texte + U+FE0F comme ❤️) est compté directement ;
+# seuls ceux qui contiennent une vraie séquence (U+200D, touche, tag, © + U+FE0F...)
+# passent par la regex. Les deux donnent le même compte (tests/test_emojis.py).
+_OTHER, _SIMPLE, _SEQUENCE, _TEXT, _REGIONAL = 0, 1, 2, 3, 4
+_SCAN_BLOCK = 1 << 20
+
+
+@functools.cache
+def _code_point_classes():
+    # Classe de chaque code point Unicode (table de 1,1 Mo, construite au premier appel)
+    classes = np.zeros(0x110000, dtype=np.int8)
+    for start, end in _PICTOGRAPH_RANGES:
+        classes[start:end + 1] = _SIMPLE
+    for start, end in _TEXT_DEFAULT_RANGES:
+        classes[start:end + 1] = _TEXT
+    # Après les pictogrammes : les tons de peau sont dans une de leurs plages
+    for start, end in (_SKIN_TONE_RANGE, _TAG_RANGE):
+        classes[start:end + 1] = _SEQUENCE
+    classes[_REGIONAL_INDICATOR_RANGE[0]:_REGIONAL_INDICATOR_RANGE[1] + 1] = _REGIONAL
+    classes[[_VARIATION_SELECTOR, _ZWJ, _KEYCAP]] = _SEQUENCE
+    return classes
+
+
+def _arrow_strings(messages):
+    # Chaînes de la colonne en un seul tableau Arrow large_string (None si pyarrow est absent)
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return None
+    if getattr(messages.dtype, 'storage', None) == 'pyarrow':
+        strings = pa.array(messages.array)
+    else:
+        strings = pa.array(messages.to_numpy(dtype=object), type=pa.large_string(), from_pandas=True)
+    if isinstance(strings, pa.ChunkedArray):
+        strings = strings.combine_chunks()
+    return strings.cast(pa.large_string())
+
+
+def _decode(data, begin, stop):
+    # Code points des caractères d'au moins U+2000 qui commencent dans data[begin:stop] et ne sont
+    # pas de classe _OTHER, avec leur position et leur classe
+    positions = np.flatnonzero(data[begin:stop] >= 0xE2) + begin
+    lead = data[positions].astype(np.int32)
+    # Octets de continuation (un caractère de 3 octets lit un octet de trop, ignoré ensuite)
+    last = len(data) - 1
+    b1, b2, b3 = (data[np.minimum(positions + k, last)].astype(np.int32) & 0x3F for k in (1, 2, 3))
+    code_points = np.where(lead >= 0xF0, ((lead & 0x07) << 18) | (b1 << 12) | (b2 << 6) | b3,
+                           ((lead & 0x0F) << 12) | (b1 << 6) | b2)
+    classes = _code_point_classes()[np.minimum(code_points, 0x10FFFF)]
+    keep = classes != _OTHER
+    return positions[keep], code_points[keep], classes[keep]
+
+
+def _scan(strings):
+    # Renvoie (lignes, classes) des pictogrammes et des caractères de séquence des messages, dans l'ordre
+    _, offsets_buffer, data_buffer = strings.buffers()
+    offsets = np.frombuffer(offsets_buffer, dtype=np.int64, count=len(strings) + 1, offset=strings.offset * 8)
+    if data_buffer is None or offsets[-1] == offsets[0]:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int8)
+    start, end = int(offsets[0]), int(offsets[-1])
+    data = np.frombuffer(data_buffer, dtype=np.uint8)[:end]
+    # Une seule passe sur le buffer, par blocs qui restent en cache (les octets de continuation
+    # d'un caractère à cheval sur deux blocs sont lus dans le buffer complet)
+    blocks = [_decode(data, begin, min(begin + _SCAN_BLOCK, end)) for begin in range(start, end, _SCAN_BLOCK)]
+    positions, code_points, classes = (np.concatenate(parts) for parts in zip(*blocks))
+    four_bytes = code_points >= 0x10000
+    rows = np.searchsorted(offsets, positions, side='right') - 1
+
+    # U+FE0F collé à un pictogramme (🌡️) ou à un caractère texte (❤️), puis ton de peau collé à l'un
+    # ou à l'autre (👍🏽) : absorbés par l'emoji précédent, inutile de passer par la regex pour eux.
+    # Un caractère texte ne compte que suivi de U+FE0F : c'est alors le sélecteur qui compte pour 1.
+    follows = np.zeros(len(positions), dtype=bool)
+    follows[1:] = (positions[1:] == positions[:-1] + 3 + four_bytes[:-1]) & (rows[1:] == rows[:-1])
+    previous = np.concatenate([[_OTHER], classes[:-1]])
+    selector = follows & (code_points == _VARIATION_SELECTOR)
+    text_selector = selector & (previous == _TEXT)
+    selector &= previous == _SIMPLE
+    after_selector = np.concatenate([[False], (selector | text_selector)[:-1]])
+    skin_tone = ((code_points >= _SKIN_TONE_RANGE[0]) & (code_points <= _SKIN_TONE_RANGE[1])
+                 & follows & ((previous == _SIMPLE) | after_selector))
+    classes[text_selector] = _SIMPLE
+    # Drapeaux : indicateurs régionaux collés, appariés de gauche à droite comme le fait la regex
+    regional = classes == _REGIONAL
+    index = np.arange(len(classes))
+    run_start = np.where(regional & ~(follows & (previous == _REGIONAL)), index, 0)
+    even = (index - np.maximum.accumulate(run_start)) % 2 == 0
+    classes[regional & even & np.append(follows[1:] & regional[1:], False)] = _SIMPLE
+    kept = ~(selector | skin_tone) & (classes != _TEXT) & (classes != _REGIONAL)
+    return rows[kept], classes[kept]
+
+
+def _counts_and_candidates(messages):
+    # Nombre d'emojis et masque des messages qui en contiennent (via le scan des octets si possible)
+    strings = _arrow_strings(messages)
+    if strings is None:
+        candidates = messages.str.contains(_CANDIDATE_REGEX, regex=True, na=False).to_numpy(dtype=bool)
+        counts = np.zeros(len(messages), dtype=np.int32)
+        if candidates.any():
+            counts[candidates] = messages[candidates].str.count(EMOJI_REGEX).to_numpy(dtype=np.int32)
+        return counts, candidates
+
+    import pyarrow.compute as pc
+    rows, classes = _scan(strings)
+    counts = np.bincount(rows[classes == _SIMPLE], minlength=len(strings)).astype(np.int32)
+    sequences = rows[classes == _SEQUENCE]
+    sequences = sequences[np.diff(sequences, prepend=-1) != 0]  # Lignes déjà triées : dédoublonnage direct
+    if len(sequences):
+        counts[sequences] = pc.count_substring_regex(strings.take(sequences), EMOJI_REGEX).to_numpy(zero_copy_only=False)
+    return counts, counts > 0
+
+
+def _candidates(messages):
+    return _counts_and_candidates(messages)[1]
+
+
+def emoji_counts(messages):
+    # Nombre d'emojis de chaque message (séquence complète = 1 emoji)
+    return pd.Series(_counts_and_candidates(messages)[0], index=messages.index, dtype='int32')
+
+
+def emoji_frequencies(messages, authors):
+    # Table de fréquence auteur x emoji (une colonne par emoji utilisé)
+    candidates = _candidates(messages)
+    found = messages[candidates].str.findall(EMOJI_REGEX)
+    long = pd.DataFrame({'author': authors[candidates].astype(str), 'emoji': found}).explode('emoji').dropna()
+    return long.groupby(['author', 'emoji']).size().unstack(fill_value=0)
+
+
+def top_emojis(frequencies, author, k=5):
+    if author not in frequencies.index:
+        return []
+    row = frequencies.loc[author]
+    return list(row[row > 0].nlargest(k).items())
@@ -0,0 +1,222 @@
+# Faux serveur de l'API Messages d'Anthropic, pour tester l'analyse IA sans clé ni coût.
+# Lancement : python fake_anthropic.py --port 8765 --latency 0.5 --error-rate 0.1
+# puis : ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=fake-key-pour-les-tests python main.py
+# Gère aussi les lots Message Batches (création, état, résultats), terminés après --batch-delay secondes.
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHARS_PER_TOKEN = 4
+
+
+def fake_message(model, max_tokens, content):
+    # Réponse au format de l'API : un seul bloc texte qui résume la demande
+    first_line = content.strip().splitlines()[0][:80] if content.strip() else ""
+    text = f"[réponse simulée] {len(content):,} caractères reçus. Début : {first_line}"
+    return {
+        "id": f"msg_fake_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": model,
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {
+            "input_tokens": max(1, len(content) // CHARS_PER_TOKEN),
+            "output_tokens": min(max_tokens, max(1, len(text) // CHARS_PER_TOKEN)),
+        },
+    }
+
+
+def _message_content(body):
+    return "".join(
+        message["content"] if isinstance(message["content"], str)
+        else "".join(block.get("text", "") for block in message["content"])
+        for message in body.get("messages", [])
+    )
+
+
+def _timestamp(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class FakeAnthropicServer:
+    # Serveur HTTP local dans un thread ; base_url à donner au client (ou à ANTHROPIC_BASE_URL).
+    # latency : secondes par appel ; error_rate : part des appels qui échouent avec error_status
+    # (pour un lot : part des requêtes en "errored") ; batch_delay : durée de traitement d'un lot
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, error_rate=0.0, error_status=529, seed=None,
+                 batch_delay=2.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.batch_delay = batch_delay
+        self.batches = {}  # id -> {"created": ..., "requests": [...]}
+        self.requests = 0
+        self.errors = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, headers=()):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _not_found(self):
+                self._send(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                path = self.path.split("?")[0]
+                if path == "/v1/messages":
+                    server._handle_message(self, body)
+                elif path == "/v1/messages/batches":
+                    self._send(200, server._create_batch(body))
+                else:
+                    self._not_found()
+
+            def do_GET(self):
+                parts = self.path.split("?")[0].strip("/").split("/")
+                if parts[:3] != ["v1", "messages", "batches"] or len(parts) not in (4, 5) \
+                        or parts[3] not in server.batches:
+                    self._not_found()
+                elif len(parts) == 4:
+                    self._send(200, server._batch_object(parts[3]))
+                elif parts[4] == "results" and server._batch_ended(parts[3]):
+                    payload = server._batch_results(parts[3]).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/binary")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                else:
+                    self._not_found()
+
+        return Handler
+
+    def _handle_message(self, handler, body):
+        with self._lock:
+            self.requests += 1
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            if failed:
+                error_type = "rate_limit_error" if self.error_status == 429 else "overloaded_error"
+                handler._send(self.error_status, {"type": "error", "error": {"type": error_type, "message": "simulé"}},
+                              headers=[("retry-after", "0")])
+                return
+            handler._send(200, fake_message(body.get("model", ""), body.get("max_tokens", 1), _message_content(body)))
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    # === Lots Message Batches ===
+    def _create_batch(self, body):
+        batch_id = f"msgbatch_fake_{uuid.uuid4().hex[:24]}"
+        with self._lock:
+            self.batches[batch_id] = {"created": time.time(), "requests": body.get("requests", [])}
+        return self._batch_object(batch_id)
+
+    def _batch_ended(self, batch_id):
+        return time.time() - self.batches[batch_id]["created"] >= self.batch_delay
+
+    def _batch_object(self, batch_id):
+        batch = self.batches[batch_id]
+        ended = self._batch_ended(batch_id)
+        total = len(batch["requests"])
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {"processing": 0 if ended else total, "succeeded": total if ended else 0,
+                               "errored": 0, "canceled": 0, "expired": 0},
+            "created_at": _timestamp(batch["created"]),
+            "expires_at": _timestamp(batch["created"] + timedelta(days=1).total_seconds()),
+            "ended_at": _timestamp(batch["created"] + self.batch_delay) if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"{self.base_url}/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    def _batch_results(self, batch_id):
+        lines = []
+        for request in self.batches[batch_id]["requests"]:
+            params = request["params"]
+            with self._lock:
+                failed = self._random.random() < self.error_rate
+            if failed:
+                result = {"type": "errored",
+                          "error": {"type": "error", "error": {"type": "overloaded_error", "message": "simulé"}}}
+            else:
+                result = {"type": "succeeded",
+                          "message": fake_message(params.get("model", ""), params.get("max_tokens", 1),
+                                                  _message_content(params))}
+            lines.append(json.dumps({"custom_id": request["custom_id"], "result": result}))
+        return "\n".join(lines) + "\n"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Faux serveur de l'API Messages d'Anthropic")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="Secondes par appel")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Part des appels en erreur (0-1)")
+    parser.add_argument("--error-status", type=int, default=529, choices=[429, 529])
+    parser.add_argument("--batch-delay", type=float, default=5.0, help="Secondes avant qu'un lot soit terminé")
+    options = parser.parse_args()
+    server = FakeAnthropicServer(options.host, options.port, options.latency, options.error_rate, options.error_status,
+                                 batch_delay=options.batch_delay)
+    print(f"🧪 Faux serveur Anthropic sur {server.base_url} (Ctrl+C pour arrêter)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
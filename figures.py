@@ -0,0 +1,224 @@
+import fnmatch
+import hashlib
+import inspect
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from chat_parser import pool_context
+from instrumentation import add_span
+
+# À incrémenter si un réglage commun à toutes les figures change (backend, dpi...)
+STYLE_VERSION = 1
+MANIFEST_NAME = ".render_manifest.json"
+
+
+@dataclass
+class FigureJob:
+    # Une figure = une fonction de rendu de ce module + les données déjà agrégées
+    # dont elle a besoin (petites : jamais le DataFrame des messages)
+    name: str
+    render: object
+    path: str
+    data: dict
+
+
+def _pyplot():
+    # Backend headless : rendu identique dans le process principal et dans les workers
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+# === Fonctions de rendu (une par famille de figures) ===
+def plot_top_authors_bar(plt, top_authors, top_n):
+    plt.figure(figsize=(10, 6))
+    top_authors.plot(kind='bar')
+    plt.title(f'Top {top_n} - Nombre de messages par auteur')
+    plt.xlabel('Auteur')
+    plt.ylabel('Nombre de messages')
+    plt.xticks(rotation=45, ha='right')
+
+
+def plot_daily_participation(plt, daily_counts_top, top_n):
+    plt.figure(figsize=(14, 6))
+    daily_counts_top.plot(ax=plt.gca())
+    plt.title(f'Top {top_n} - Participation quotidienne par auteur')
+    plt.xlabel('Date')
+    plt.ylabel('Nombre de messages')
+    plt.legend(title='Auteur', bbox_to_anchor=(1.05, 1), loc='upper left')
+
+
+def plot_hourly_distribution(plt, hourly_counts_top, top_n):
+    plt.figure(figsize=(14, 6))
+    hourly_counts_top.plot(ax=plt.gca())
+    plt.title(f'Top {top_n} - Répartition horaire des messages par auteur')
+    plt.xlabel('Heure de la journée')
+    plt.ylabel('Nombre de messages')
+    plt.legend(title='Auteur', bbox_to_anchor=(1.05, 1), loc='upper left')
+
+
+def plot_participation_pie(plt, top_authors, top_n):
+    plt.figure(figsize=(8, 8))
+    top_authors.plot(kind='pie', autopct='%1.1f%%', startangle=90, colormap='tab20')
+    plt.title(f'Top {top_n} - Pourcentage de participation par auteur')
+    plt.ylabel('')
+
+
+def plot_heatmap(plt, matrix, vmax, title):
+    import matplotlib.colors as mcolors  # Pour la normalisation non-linéaire
+    import seaborn as sns  # Pour la heatmap
+
+    plt.figure(figsize=(20, 6))
+    # Normalisation non-linéaire pour étaler les petites valeurs (racine carrée)
+    norm = mcolors.PowerNorm(gamma=0.5, vmin=0, vmax=vmax)
+    sns.heatmap(matrix, cmap='YlGn', cbar=True, linewidths=0.5, square=True, norm=norm)
+    plt.title(title)
+    plt.xlabel('Semaine de l\'année')
+    plt.ylabel('Jour de la semaine (0=lundi)')
+
+
+def plot_words_histogram(plt, counts, edges, mean, median):
+    # Histogramme déjà calculé (np.histogram) : seules les 50 barres sont transmises
+    plt.figure(figsize=(12, 6))
+    plt.hist(edges[:-1], bins=edges, weights=counts, alpha=0.7, edgecolor='black')
+    plt.grid(True)
+    plt.title('Distribution du nombre de mots par message')
+    plt.xlabel('Nombre de mots par message')
+    plt.ylabel('Fréquence')
+    plt.axvline(mean, color='red', linestyle='--', label=f'Moyenne: {mean:.1f}')
+    plt.axvline(median, color='orange', linestyle='--', label=f'Médiane: {median:.1f}')
+    plt.legend()
+
+
+def plot_communication_style(plt, points):
+    # points : [(auteur, nombre de messages, moyenne de mots par message), ...]
+    plt.figure(figsize=(12, 8))
+    for author, msg_count, avg_words in points:
+        plt.scatter(msg_count, avg_words, s=100, alpha=0.7, label=author)
+        plt.annotate(author, (msg_count, avg_words), xytext=(5, 5), textcoords='offset points', fontsize=8)
+
+    plt.xlabel('Nombre total de messages')
+    plt.ylabel('Moyenne de mots par message')
+    plt.title('Style de communication : Bavard vs Prolixe')
+    plt.grid(True, alpha=0.3)
+
+
+def plot_message_types(plt, message_types_top):
+    plt.figure(figsize=(14, 8))
+    message_types_top.plot(kind='bar', stacked=True, ax=plt.gca())
+    plt.title('Répartition des types de messages par auteur')
+    plt.xlabel('Auteur')
+    plt.ylabel('Nombre de messages')
+    plt.xticks(rotation=45, ha='right')
+    plt.legend(title='Type de message')
+
+
+def plot_hourly_activity_top3(plt, hourly_activity):
+    plt.figure(figsize=(14, 6))
+    hourly_activity.plot(kind='area', stacked=False, alpha=0.7, ax=plt.gca())
+    plt.title('Activité horaire des 3 auteurs les plus actifs')
+    plt.xlabel('Heure de la journée')
+    plt.ylabel('Nombre de messages')
+    plt.legend(title='Auteur')
+    plt.grid(True, alpha=0.3)
+
+
+def plot_media_emoji(plt, media_emoji_top):
+    plt.figure(figsize=(14, 6))
+    x = range(len(media_emoji_top))
+    width = 0.35
+    plt.bar([i - width/2 for i in x], media_emoji_top['pct_media'], width, label='% Messages avec média', alpha=0.8)
+    plt.bar([i + width/2 for i in x], media_emoji_top['pct_emoji'], width, label='% Messages avec emoji', alpha=0.8)
+    plt.xlabel('Auteur')
+    plt.ylabel('Pourcentage (%)')
+    plt.title('Usage des médias et emojis par auteur')
+    plt.xticks(x, media_emoji_top['author'], rotation=45, ha='right')
+    plt.legend()
+
+
+# === Exécution des jobs ===
+def render_job(job):
+    plt = _pyplot()
+    start = time.perf_counter()
+    job.render(plt, **job.data)
+    plt.tight_layout()
+    plt.savefig(job.path)
+    plt.close()
+    return job.name, time.perf_counter() - start
+
+
+# === Manifeste de rendu : une figure n'est redessinée que si ses données ou son style changent ===
+def _feed(digest, value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        dtypes = value.dtypes.tolist() if isinstance(value, pd.DataFrame) else value.dtype
+        digest.update(repr((type(value).__name__, value.shape, list(value.axes[-1]), dtypes)).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(repr((value.shape, str(value.dtype))).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        for key in sorted(value):
+            digest.update(repr(key).encode())
+            _feed(digest, value[key])
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__}{len(value)}".encode())
+        for item in value:
+            _feed(digest, item)
+    else:
+        digest.update(repr(value).encode())
+
+
+def job_hash(job):
+    # Données d'entrée + code de la fonction de rendu (ses réglages de style) + version commune
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{STYLE_VERSION}:{inspect.getsource(job.render)}".encode())
+    _feed(digest, job.data)
+    return digest.hexdigest()
+
+
+def _load_manifest(path):
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def _save_manifest(path, manifest):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def render_figures(jobs, workers=1, manifest_path=None, only=None, force=False):
+    # Rend les figures dans un pool de processus et affiche le temps de rendu de chacune.
+    # only : motifs sur les noms de figures (ex: "heatmap_*") ; force : ignore le manifeste
+    if only:
+        jobs = [job for job in jobs if any(fnmatch.fnmatch(job.name, pattern) for pattern in only)]
+    manifest = _load_manifest(manifest_path)
+    hashes = {job.path: job_hash(job) for job in jobs}
+    todo = [job for job in jobs
+            if force or manifest.get(job.path) != hashes[job.path] or not os.path.exists(job.path)]
+    if len(todo) < len(jobs):
+        print(f"  ⏭️  {len(jobs) - len(todo)} figure(s) inchangée(s), non redessinée(s)")
+
+    if workers > 1 and len(todo) > 1 and pool_context() is not None:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as pool:
+            timings = list(pool.map(render_job, todo))
+    else:
+        timings = [render_job(job) for job in todo]
+    for name, seconds in timings:
+        print(f"  🖼️  {name} : {seconds:.2f}s")
+        add_span("figure", seconds, figure=name)
+
+    if manifest_path:
+        manifest.update({job.path: hashes[job.path] for job in todo})
+        _save_manifest(manifest_path, manifest)
+    return timings
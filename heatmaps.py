@@ -0,0 +1,79 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+GLOBAL_DEFAULT_VMAX = 10
+AUTHOR_MIN_VMAX = 5  # Minimum de 5 pour avoir un dégradé visible
+
+
+@dataclass
+class Heatmaps:
+    # Toutes les heatmaps type GitHub en un seul tableau dense :
+    # cube[auteur, jour de la semaine (0=lundi), index de semaine]
+    authors: list
+    week_labels: list
+    cube: np.ndarray
+    author_vmax: np.ndarray
+    global_matrix: np.ndarray
+    global_vmax: int
+
+    def _frame(self, matrix):
+        return pd.DataFrame(matrix, index=pd.RangeIndex(7), columns=self.week_labels)
+
+    def global_frame(self):
+        return self._frame(self.global_matrix)
+
+    def author_frame(self, author):
+        if author not in self._positions:
+            return self._frame(np.zeros_like(self.global_matrix)), AUTHOR_MIN_VMAX
+        position = self._positions[author]
+        return self._frame(self.cube[position]), int(self.author_vmax[position])
+
+    def __post_init__(self):
+        self._positions = {author: i for i, author in enumerate(self.authors)}
+
+
+def _nonzero_quantile(values, q):
+    # 95e percentile des cases non nulles de chaque ligne (NaN si la ligne est vide)
+    masked = np.where(values > 0, values, np.nan)
+    result = np.full(len(values), np.nan)
+    filled = ~np.isnan(masked).all(axis=1)
+    if filled.any():
+        result[filled] = np.nanquantile(masked[filled], q, axis=1)
+    return result
+
+
+def build_heatmaps(daily_counts):
+    # daily_counts : messages par jour (index datetime) et par auteur (colonnes)
+    days = pd.DatetimeIndex(daily_counts.index)
+    start = days.min()
+    # Semaines continues depuis le lundi de la première semaine : pas de collision
+    # entre la semaine ISO 1 et les derniers jours de décembre (ancien groupby année/semaine ISO)
+    positions = (days - start).days.to_numpy() + start.weekday()
+    weekdays, weeks = positions % 7, positions // 7
+    n_weeks = int(weeks.max()) + 1 if len(weeks) else 0
+
+    counts = daily_counts.to_numpy(dtype=np.int64)
+    cube = np.zeros((counts.shape[1], 7, n_weeks), dtype=np.int64)
+    # Dispersion de tous les auteurs d'un coup (un jour = une case unique par auteur)
+    cube[:, weekdays, weeks] = counts.T
+
+    global_matrix = cube.sum(axis=0)
+    global_q = _nonzero_quantile(global_matrix.reshape(1, -1), 0.95)[0]
+    author_q = _nonzero_quantile(cube.reshape(len(cube), -1), 0.95)
+    author_vmax = np.where(np.isnan(author_q), AUTHOR_MIN_VMAX,
+                           np.maximum(AUTHOR_MIN_VMAX, np.nan_to_num(author_q).astype(np.int64)))
+
+    mondays = start - pd.Timedelta(days=start.weekday()) + pd.to_timedelta(np.arange(n_weeks) * 7, unit='D')
+    iso = mondays.isocalendar()
+    week_labels = [f"{year}-S{week:02d}" for year, week in zip(iso['year'], iso['week'])]
+
+    return Heatmaps(
+        authors=[str(author) for author in daily_counts.columns],
+        week_labels=week_labels,
+        cube=cube,
+        author_vmax=author_vmax,
+        global_matrix=global_matrix,
+        global_vmax=GLOBAL_DEFAULT_VMAX if np.isnan(global_q) else int(global_q),
+    )
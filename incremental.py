@@ -0,0 +1,88 @@
+import pandas as pd
+
+from chat_cache import CACHE_DIR, appended_offset, cache_path, load_cache_meta, load_cached_chat
+from chat_parser import NAT, parse_chat_range
+from emojis import emoji_frequencies
+from stats_cube import StatsCube
+
+# À incrémenter si le contenu des agrégats change (les anciens sont alors recalculés)
+AGGREGATES_VERSION = 2
+
+
+# === Chargement incrémental : ancien DataFrame en cache + nouveaux messages seulement ===
+def load_appended_chat(input_file, features_version, enrich, cache_dir=CACHE_DIR):
+    # Renvoie (df complet, df des nouveaux messages) si chat.txt n'a fait que
+    # grandir depuis le dernier run, sinon None (il faut tout reparser)
+    start = appended_offset(input_file, features_version, cache_dir)
+    if start is None:
+        return None
+    meta = load_cache_meta(input_file, features_version, cache_dir)
+    tail = parse_chat_range(input_file, start, date_order=meta.get("date_order"))
+    if tail is None:
+        return None
+    valid = tail.timestamps[tail.timestamps != NAT]
+    if len(valid) and meta["last_timestamp"] != NAT and valid.min() < meta["last_timestamp"]:
+        # Des messages plus anciens que le dernier traité : ce n'est pas un simple ajout
+        return None
+    previous_df = load_cached_chat(input_file, features_version, cache_dir, verify_source=False)
+    if previous_df is None:
+        return None
+
+    new_df = tail.to_dataframe()
+    enrich(new_df)
+    return concat_enriched(previous_df, new_df), new_df
+
+
+def concat_enriched(previous_df, new_df):
+    # pd.concat repasse en object si les catégories diffèrent : on les unifie d'abord
+    for column in previous_df.columns:
+        if isinstance(previous_df[column].dtype, pd.CategoricalDtype):
+            categories = pd.api.types.union_categoricals([previous_df[column], new_df[column]]).categories
+            if column == 'author':
+                categories = sorted(categories)
+            previous_df[column] = previous_df[column].cat.set_categories(categories)
+            new_df[column] = new_df[column].cat.set_categories(categories)
+    return pd.concat([previous_df, new_df], ignore_index=True)
+
+
+# === Agrégats fusionnables (sommes et comptages : ancien + delta = nouveau) ===
+def compute_aggregates(df):
+    emoji_table = emoji_frequencies(df['message'], df['author'])
+    # Auteurs en chaînes simples : les catégories diffèrent d'un run à l'autre
+    emoji_table.index = emoji_table.index.astype(str)
+    return {
+        'cube': StatsCube.from_messages(df),
+        'emoji_frequencies': emoji_table,
+    }
+
+
+def merge_aggregates(aggregates, delta):
+    return {
+        'cube': aggregates['cube'].merge(delta['cube']),
+        'emoji_frequencies': aggregates['emoji_frequencies'].add(delta['emoji_frequencies'], fill_value=0)
+                                                           .fillna(0).astype('int64').sort_index(),
+    }
+
+
+def stats_from_aggregates(aggregates):
+    stats = aggregates['cube'].totals('author')[['nb_messages', 'nb_mots']]
+    stats['moyenne_mots'] = stats['nb_mots'] / stats['nb_messages']
+    return stats
+
+
+def load_aggregates(input_file, digest, cache_dir=CACHE_DIR):
+    # Agrégats du dernier run, seulement s'ils correspondent au cache du chat (même empreinte)
+    path = cache_path(input_file, ".aggregates.pkl", cache_dir)
+    if digest is None or not path.exists():
+        return None
+    saved = pd.read_pickle(path)
+    if saved.get('digest') != digest or saved.get('version') != AGGREGATES_VERSION:
+        return None
+    return saved['aggregates']
+
+
+def save_aggregates(input_file, digest, aggregates, cache_dir=CACHE_DIR):
+    if digest is None:
+        return
+    pd.to_pickle({'digest': digest, 'version': AGGREGATES_VERSION, 'aggregates': aggregates},
+                 cache_path(input_file, ".aggregates.pkl", cache_dir))
@@ -0,0 +1,188 @@
+# Mesures d'un run : durée de chaque étape et sous-étape (spans imbriqués), mémoire, octets lus
+# et écrits, latence et tokens de chaque appel API. Rapport JSON en fin de run (run_report.json)
+# et profil cProfile optionnel d'une étape :
+#   python main.py --report rapport.json --profile figures    # → profile_figures.prof
+#   python -m pstats profile_figures.prof
+# Sans start_run(), span() et record_call() ne coûtent presque rien et n'enregistrent rien.
+import contextlib
+import contextvars
+import cProfile
+import json
+import os
+import resource
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+REPORT_VERSION = 1
+REPORT_FILE = "run_report.json"
+PROFILE_PATTERN = "profile_{stage}.prof"
+
+_run = None  # Run en cours (un seul par processus)
+# Span englobant : suit les tâches asyncio (chaque tâche hérite du contexte de sa création)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+# === Mémoire et entrées/sorties du processus ===
+def current_rss():
+    # RSS actuel en octets (Linux) ; ailleurs, pic depuis le début du processus
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return peak_rss()
+
+
+def peak_rss(who=resource.RUSAGE_SELF):
+    # ru_maxrss : octets sous macOS, Ko ailleurs. RUSAGE_CHILDREN : plus gros processus enfant terminé
+    peak = resource.getrusage(who).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def io_counters():
+    # Octets lus et écrits par le processus (appels read/write, cache disque compris) ; None hors Linux
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(":") for line in f if ":" in line)
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _mb(n_bytes):
+    return round(n_bytes / 1e6, 1)
+
+
+class _Run:
+    def __init__(self, command, profile_stage):
+        self.command = command
+        self.profile_stage = profile_stage
+        self.started = datetime.now()
+        self.start = time.perf_counter()
+        self.io_start = io_counters()
+        self.spans = []
+        self.calls = []
+        self.profile_path = None
+
+
+def start_run(command=None, profile_stage=None):
+    # Démarre l'enregistrement (efface le run précédent du processus)
+    global _run
+    _run = _Run(command, profile_stage)
+    _current_span.set(None)
+
+
+@contextlib.contextmanager
+def span(name, **fields):
+    # Mesure un bloc : durée, RSS à la fin, pic de RSS du processus jusque-là, octets lus/écrits.
+    # fields : détails libres (auteur, figure...) recopiés dans le rapport
+    run = _run
+    if run is None:
+        yield
+        return
+    parent = _current_span.get()
+    record = {"name": name, "parent": parent["id"] if parent else None, **fields}
+    record["id"] = len(run.spans)
+    run.spans.append(record)  # Ajouté au début : les spans restent dans l'ordre de démarrage
+    token = _current_span.set(record)
+    profiler = None
+    if run.profile_stage == name and run.profile_path is None:
+        profiler = cProfile.Profile()
+    io_start = io_counters()
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            run.profile_path = PROFILE_PATTERN.format(stage=name)
+            profiler.dump_stats(run.profile_path)
+        record["start_s"] = round(start - run.start, 4)
+        record["seconds"] = round(time.perf_counter() - start, 4)
+        record["rss_mb"] = _mb(current_rss())
+        record["max_rss_mb"] = _mb(peak_rss())
+        io_end = io_counters()
+        if io_start and io_end:
+            record["read_mb"] = _mb(io_end[0] - io_start[0])
+            record["written_mb"] = _mb(io_end[1] - io_start[1])
+        _current_span.reset(token)
+
+
+def add_span(name, seconds, **fields):
+    # Span mesuré ailleurs (ex : figure rendue dans un processus du pool), rattaché au span en cours
+    if _run is None:
+        return
+    parent = _current_span.get()
+    _run.spans.append({"name": name, "parent": parent["id"] if parent else None, **fields,
+                       "id": len(_run.spans), "seconds": round(seconds, 4)})
+
+
+def record_call(model, seconds, input_tokens=0, output_tokens=0, status="ok", attempt=0):
+    # Un appel API : latence, tokens (response.usage), statut ("ok", "cache" ou code HTTP), tentative
+    if _run is None:
+        return
+    parent = _current_span.get()
+    _run.calls.append({"model": model, "span": parent["id"] if parent else None,
+                       "author": parent.get("author") if parent else None, "status": status, "attempt": attempt,
+                       "seconds": round(seconds, 4), "input_tokens": input_tokens, "output_tokens": output_tokens})
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 4) if values else None
+
+
+def call_summary(calls):
+    sent = [call for call in calls if call["status"] != "cache"]
+    latencies = [call["seconds"] for call in sent]
+    return {
+        "calls": len(sent),
+        "errors": sum(call["status"] != "ok" for call in sent),  # Réponses en erreur, retentées ou non
+        "cache_hits": len(calls) - len(sent),
+        "input_tokens": sum(call["input_tokens"] for call in sent),
+        "output_tokens": sum(call["output_tokens"] for call in sent),
+        "latency_p50_s": _percentile(latencies, 0.5),
+        "latency_p95_s": _percentile(latencies, 0.95),
+        "latency_max_s": max(latencies, default=None),
+    }
+
+
+def build_report(**extra):
+    run = _run
+    io_end = io_counters()
+    report = {
+        "version": REPORT_VERSION,
+        "command": run.command,
+        "started": run.started.isoformat(timespec="seconds"),
+        "seconds": round(time.perf_counter() - run.start, 4),
+        "max_rss_mb": _mb(peak_rss()),
+        # Processus du pool (parse, figures) : pic du plus gros d'entre eux
+        "max_rss_children_mb": _mb(peak_rss(resource.RUSAGE_CHILDREN)),
+        "stages": {span["name"]: span["seconds"] for span in run.spans
+                   if span["parent"] is None and "seconds" in span},
+        "api": call_summary(run.calls),
+        "profile": run.profile_path,
+        **extra,
+        "spans": run.spans,
+        "api_calls": run.calls,
+    }
+    if run.io_start and io_end:
+        report["read_mb"] = _mb(io_end[0] - run.io_start[0])
+        report["written_mb"] = _mb(io_end[1] - run.io_start[1])
+    return report
+
+
+def write_report(path=REPORT_FILE, **extra):
+    # Rapport du run en cours (None si aucun run) ; écrit d'un bloc pour ne jamais laisser un JSON tronqué
+    if _run is None:
+        return None
+    report = build_report(**extra)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(report, indent=1, ensure_ascii=False, default=str), encoding="utf-8")
+    os.replace(tmp_path, path)
+    return report
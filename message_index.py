@@ -0,0 +1,225 @@
+# Index inversé des messages sur disque : terme -> messages qui le contiennent,
+# avec auteur, horodatage et texte de chaque message (lecture en mmap).
+# Recherche en ligne de commande :
+#   python message_index.py build chat.txt
+#   python message_index.py search chat.txt "macron impots" --author Gis --since 2023-01-01
+import argparse
+import json
+import math
+import os
+import re
+import shutil
+from array import array
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from chat_cache import CACHE_DIR, cache_path, file_digest
+from chat_parser import NAT
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".index"
+
+TOKEN_REGEX = re.compile(r"\w{2,}")
+# Recherche insensible aux accents : "élection" et "election" donnent le même terme
+_ACCENTS = str.maketrans("àâäáãåçéèêëíìîïñóòôöõúùûüýÿœæ", "aaaaaaceeeeiiiinooooouuuuyyoa")
+STOPWORDS = frozenset("""
+    au aux avec ce ces cet cette dans de des du elle en est et eu il ils je la le les leur lui ma mais me
+    mes moi mon ne nos notre nous on ou par pas pour qu que qui sa se ses son sur ta te tes toi ton tu un
+    une vos votre vous ça ca c est j l d n s t y a etait suis es sont ai as avait
+""".split())
+
+# Paramètres BM25 (présence du terme seulement : un message est court, la fréquence compte peu)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def normalize(text):
+    return text.casefold().translate(_ACCENTS)
+
+
+def tokenize(text):
+    return [token for token in TOKEN_REGEX.findall(normalize(text)) if token not in STOPWORDS]
+
+
+def index_dir(input_file, cache_dir=CACHE_DIR):
+    return cache_path(input_file, INDEX_SUFFIX, cache_dir)
+
+
+def build_index(path, authors, author_codes, timestamps, messages, digest=None):
+    # Une seule passe sur les messages : postings par terme, longueurs et texte écrits au fil de l'eau
+    tmp_path = Path(f"{path}.tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+
+    postings = {}
+    lengths = array("i")
+    text_offsets = array("q", [0])
+    with open(tmp_path / "text.bin", "wb", buffering=1 << 20) as text_file:
+        for doc_id, message in enumerate(messages):
+            tokens = tokenize(message)
+            lengths.append(len(tokens))
+            for token in set(tokens):
+                doc_ids = postings.get(token)
+                if doc_ids is None:
+                    doc_ids = postings[token] = array("i")
+                doc_ids.append(doc_id)
+            data = message.encode("utf-8")
+            text_file.write(data)
+            text_offsets.append(text_offsets[-1] + len(data))
+
+    terms = sorted(postings)
+    sizes = np.fromiter((len(postings[term]) for term in terms), dtype=np.int64, count=len(terms))
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    flat = np.empty(offsets[-1], dtype=np.int32)
+    for term, start, end in zip(terms, offsets[:-1], offsets[1:]):
+        flat[start:end] = postings[term]
+
+    np.save(tmp_path / "postings.npy", flat)
+    np.save(tmp_path / "postings_offsets.npy", offsets)
+    np.save(tmp_path / "doc_authors.npy", np.asarray(author_codes, dtype=np.int32))
+    np.save(tmp_path / "doc_timestamps.npy", np.asarray(timestamps, dtype=np.int64))
+    np.save(tmp_path / "doc_lengths.npy", np.frombuffer(lengths, dtype=np.int32))
+    np.save(tmp_path / "text_offsets.npy", np.frombuffer(text_offsets, dtype=np.int64))
+    meta = {
+        "version": INDEX_VERSION,
+        "digest": digest,
+        "n_messages": len(lengths),
+        "authors": [str(author) for author in authors],
+        "terms": terms,
+    }
+    (tmp_path / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+    # Remplacement d'un bloc : un index à moitié écrit n'est jamais lu
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    return MessageIndex(path)
+
+
+def index_is_current(path, digest):
+    meta_path = Path(path) / "meta.json"
+    if digest is None or not meta_path.exists():
+        return False
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    return meta.get("version") == INDEX_VERSION and meta.get("digest") == digest
+
+
+def _to_timestamp(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return int(value.replace(tzinfo=timezone.utc).timestamp())
+
+
+class MessageIndex:
+    def __init__(self, path):
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        self.authors = meta["authors"]
+        self.terms = meta["terms"]
+        self._term_ids = {term: i for i, term in enumerate(self.terms)}
+        self._author_codes = {author: i for i, author in enumerate(self.authors)}
+        load = lambda name: np.load(path / name, mmap_mode="r")  # noqa: E731
+        self.postings = load("postings.npy")
+        self.postings_offsets = load("postings_offsets.npy")
+        self.doc_authors = load("doc_authors.npy")
+        self.doc_timestamps = load("doc_timestamps.npy")
+        self.doc_lengths = load("doc_lengths.npy")
+        self.text_offsets = load("text_offsets.npy")
+        self._text = np.memmap(path / "text.bin", dtype=np.uint8, mode="r") if self.text_offsets[-1] else b""
+        self.avg_length = max(1.0, float(np.mean(self.doc_lengths))) if len(self.doc_lengths) else 1.0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def message(self, doc_id):
+        start, end = self.text_offsets[doc_id], self.text_offsets[doc_id + 1]
+        return bytes(self._text[start:end]).decode("utf-8")
+
+    def doc_ids(self, term):
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            return self.postings[:0]
+        return self.postings[self.postings_offsets[term_id]:self.postings_offsets[term_id + 1]]
+
+    def search_ids(self, query, author=None, since=None, until=None, limit=20):
+        # Messages qui contiennent au moins un terme de la requête, classés par score BM25.
+        # query : texte libre ou liste de mots ; since/until : datetime ou "AAAA-MM-JJ"
+        words = query if isinstance(query, (list, tuple)) else [query]
+        terms = sorted({term for word in words for term in tokenize(word)})
+        n_docs = len(self)
+        ids, weights = [], []
+        for term in terms:
+            doc_ids = np.asarray(self.doc_ids(term))
+            if len(doc_ids) == 0:
+                continue
+            idf = math.log(1 + (n_docs - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            norm = 1 - BM25_B + BM25_B * self.doc_lengths[doc_ids] / self.avg_length
+            ids.append(doc_ids)
+            weights.append(idf * (BM25_K1 + 1) / (1 + BM25_K1 * norm))
+        if not ids:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        candidates, inverse = np.unique(np.concatenate(ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(weights))
+
+        keep = np.ones(len(candidates), dtype=bool)
+        if author is not None:
+            keep &= self.doc_authors[candidates] == self._author_codes.get(author, -1)
+        timestamps = self.doc_timestamps[candidates]
+        if since is not None:
+            keep &= (timestamps != NAT) & (timestamps >= _to_timestamp(since))
+        if until is not None:
+            keep &= (timestamps != NAT) & (timestamps < _to_timestamp(until))
+        candidates, scores = candidates[keep], scores[keep]
+        # Meilleurs scores d'abord, les plus anciens d'abord à score égal
+        order = np.lexsort((candidates, -scores))[:limit]
+        return candidates[order], scores[order]
+
+    def search(self, query, author=None, since=None, until=None, limit=20):
+        # Résultats lisibles : (score, auteur, date, message)
+        doc_ids, scores = self.search_ids(query, author, since, until, limit)
+        return [(float(score), self.authors[self.doc_authors[doc_id]], self.format_timestamp(doc_id),
+                 self.message(doc_id)) for doc_id, score in zip(doc_ids, scores)]
+
+    def format_timestamp(self, doc_id):
+        timestamp = int(self.doc_timestamps[doc_id])
+        if timestamp == NAT:
+            return "?"
+        return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%d %H:%M")
+
+
+def build_index_for_chat(input_file, cache_dir=CACHE_DIR, workers=1):
+    from chat_parser import parse_chat_file
+
+    chat = parse_chat_file(input_file, workers=workers)
+    return build_index(index_dir(input_file, cache_dir), chat.authors, chat.author_codes, chat.timestamps,
+                       chat.messages(), digest=file_digest(input_file))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index de recherche des messages d'un export WhatsApp")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="(Re)construire l'index d'un export")
+    build_parser.add_argument("chat", nargs="?", default="chat.txt")
+    search_parser = commands.add_parser("search", help="Chercher des messages par mots-clés")
+    search_parser.add_argument("chat", nargs="?", default="chat.txt")
+    search_parser.add_argument("query", nargs="+")
+    search_parser.add_argument("--author")
+    search_parser.add_argument("--since", help="AAAA-MM-JJ")
+    search_parser.add_argument("--until", help="AAAA-MM-JJ (exclu)")
+    search_parser.add_argument("--limit", type=int, default=20)
+    options = parser.parse_args()
+
+    path = index_dir(options.chat)
+    if options.command == "build" or not index_is_current(path, file_digest(options.chat)):
+        index = build_index_for_chat(options.chat, workers=os.cpu_count() or 1)
+        print(f"✅ Index construit : {len(index):,} messages, {len(index.terms):,} termes ({path})")
+    if options.command == "search":
+        index = MessageIndex(path)
+        results = index.search(options.query, options.author, options.since, options.until, options.limit)
+        for score, author, date, message in results:
+            print(f"{score:5.2f}  [{date}] {author}: {message}")
+        if not results:
+            print("Aucun message trouvé")
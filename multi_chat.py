@@ -0,0 +1,157 @@
+# Analyse de plusieurs exports WhatsApp en une seule commande :
+#   python multi_chat.py exports/                  # tous les *.txt du dossier
+#   python multi_chat.py "exports/*_2024.txt" --jobs 4 --output resultats
+#   python multi_chat.py exports/ -- --force       # options après "--" transmises à main.py
+# Chaque export a son propre dossier de résultats (by_authors/, figures/, cache, run.log).
+# Les exports sont répartis sur un seul pool de processus qui a déjà chargé pandas et
+# matplotlib : pas de coût de démarrage par export. Un export en erreur n'arrête pas les autres.
+import argparse
+import contextlib
+import glob
+import os
+import runpy
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from chat_parser import pool_context
+from stats_cube import StatsCube
+
+MAIN_SCRIPT = Path(__file__).resolve().with_name("main.py")
+CUBE_PATH = Path("figures") / "stats_cube.pkl"  # STATS_CUBE_FILE de pipeline.py
+LOG_NAME = "run.log"
+SUMMARY_FILE = "auteurs_multi_chats.csv"
+
+
+def find_exports(source):
+    path = Path(source)
+    if path.is_dir():
+        return sorted(path.glob("*.txt"))
+    return sorted(Path(match) for match in glob.glob(source) if Path(match).is_file())
+
+
+def output_trees(exports, output_root):
+    # Un dossier par export, nommé d'après le fichier (suffixe -2, -3... si deux exports ont le même nom)
+    trees = {}
+    for export in exports:
+        name, n = export.stem, 1
+        while name in trees:
+            n += 1
+            name = f"{export.stem}-{n}"
+        trees[name] = (export.resolve(), Path(output_root).resolve() / name)
+    return trees
+
+
+def run_chat(name, export, tree, main_args):
+    # Lance main.py sur un export, dans son dossier de résultats ; sortie dans run.log
+    tree.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    previous_cwd, previous_argv = os.getcwd(), sys.argv
+    error = None
+    with open(tree / LOG_NAME, "w", encoding="utf-8") as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            os.chdir(tree)
+            sys.argv = [str(MAIN_SCRIPT), str(export), *main_args]
+            runpy.run_path(str(MAIN_SCRIPT), run_name="__main__")
+        except (Exception, SystemExit) as exc:
+            traceback.print_exc()
+            error = f"{type(exc).__name__}: {exc}"
+        finally:
+            os.chdir(previous_cwd)
+            sys.argv = previous_argv
+    return {"chat": name, "ok": error is None, "error": error, "seconds": time.perf_counter() - start}
+
+
+def _preload():
+    # Modules lourds importés une fois dans le processus parent : les workers (fork) en héritent
+    import figures, heatmaps, pipeline, segmenter  # noqa: F401
+    with contextlib.suppress(ImportError):
+        import anthropic  # noqa: F401
+
+
+def run_all(trees, main_args, jobs):
+    results = []
+
+    def report(result):
+        if result["ok"]:
+            print(f"  ✅ {result['chat']} ({result['seconds']:.1f}s)")
+        else:
+            print(f"  ❌ {result['chat']} : {result['error']} (voir {trees[result['chat']][1] / LOG_NAME})")
+        results.append(result)
+
+    if jobs > 1 and len(trees) > 1 and pool_context() is not None:
+        _preload()
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=pool_context()) as pool:
+            futures = [pool.submit(run_chat, name, export, tree, main_args) for name, (export, tree) in trees.items()]
+            for future in as_completed(futures):
+                report(future.result())
+    else:
+        for name, (export, tree) in trees.items():
+            report(run_chat(name, export, tree, main_args))
+    return results
+
+
+# === Synthèse : auteurs présents dans plusieurs exports ===
+def author_summary(trees, results):
+    # Messages, mots et période d'activité de chaque auteur dans chaque chat, pour les auteurs
+    # qui apparaissent dans au moins deux exports (même nom d'affichage). Seuls les exports analysés
+    # sans erreur pendant ce run comptent : un cube laissé par un run précédent serait périmé
+    succeeded = {result["chat"] for result in results if result["ok"]}
+    tables = []
+    for name, (_, tree) in trees.items():
+        cube_path = tree / CUBE_PATH
+        if name not in succeeded or not cube_path.exists():
+            continue
+        cells = StatsCube.load(cube_path).cells
+        table = cells.groupby('author').agg(nb_messages=('nb_messages', 'sum'), nb_mots=('nb_mots', 'sum'),
+                                            premier_jour=('day', 'min'), dernier_jour=('day', 'max'))
+        table.insert(0, 'chat', name)
+        tables.append(table.reset_index())
+    if not tables:
+        return None
+    activity = pd.concat(tables, ignore_index=True)
+    nb_chats = activity.groupby('author')['chat'].nunique()
+    activity['nb_chats'] = activity['author'].map(nb_chats)
+    shared = activity[activity['nb_chats'] > 1]
+    return shared.sort_values(['nb_chats', 'author', 'nb_messages'], ascending=[False, True, False]).set_index(['author', 'chat'])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyse de plusieurs exports WhatsApp (un dossier de résultats par export)")
+    parser.add_argument('source', help="Dossier contenant les exports (*.txt) ou motif glob entre guillemets")
+    parser.add_argument('--output', default="multi_chats", help="Dossier des résultats (défaut : multi_chats/)")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="Exports analysés en parallèle")
+    parser.add_argument('--ai', action='store_true',
+                        help="Lancer aussi l'analyse IA de chaque export (désactivée par défaut en mode multi-chats)")
+    options, main_options = parser.parse_known_args()
+    main_options = [option for option in main_options if option != "--"]
+
+    exports = find_exports(options.source)
+    if not exports:
+        sys.exit(f"Aucun export trouvé pour {options.source}")
+    trees = output_trees(exports, options.output)
+    # Chaque export en série à l'intérieur de son worker : le parallélisme est entre exports
+    main_args = ["--workers", "1", *([] if options.ai else ["--no-ai"]), *main_options]
+
+    jobs = max(1, min(options.jobs, len(trees)))
+    print(f"=== Analyse de {len(trees)} export(s) ({jobs} processus) → {options.output}/ ===")
+    start = time.perf_counter()
+    results = run_all(trees, main_args, jobs)
+    failed = [result for result in results if not result["ok"]]
+    print(f"✅ {len(results) - len(failed)}/{len(results)} export(s) analysé(s) en {time.perf_counter() - start:.1f}s")
+
+    summary = author_summary(trees, results)
+    if summary is not None and len(summary):
+        summary_path = Path(options.output) / SUMMARY_FILE
+        summary.to_csv(summary_path)
+        print(f"\n=== Auteurs présents dans plusieurs chats ({summary_path}) ===")
+        print(summary['nb_messages'].unstack(fill_value=0))
+    else:
+        print("\nAucun auteur commun à plusieurs chats")
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,343 @@
+# Étapes de l'analyse d'un export WhatsApp, utilisables sans passer par main.py :
+#   from pipeline import RunConfig, load_chat, compute_stats
+#   config = RunConfig("chat.txt")
+#   stats = compute_stats(load_chat(config), config).stats
+# Ce module ne charge que pandas/numpy : matplotlib et seaborn sont importés au rendu des
+# figures (figures.py), anthropic par l'étape IA (ai_analysis.py).
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from author_files import AuthorFileWriter, write_author_shards
+from chat_cache import (author_files_digest, current_cache_meta, load_cache_meta, load_cached_chat,
+                        save_author_files_digest, save_cached_chat)
+from chat_parser import NAT, parse_chat_file
+from emojis import emoji_counts, top_emojis
+from incremental import (compute_aggregates, load_aggregates, load_appended_chat, merge_aggregates,
+                         save_aggregates, stats_from_aggregates)
+from instrumentation import span
+from message_index import build_index, index_dir, index_is_current
+from term_matrix import build_term_matrix, matrix_dir, matrix_is_current
+from text_features import add_text_features
+
+# === Config ===
+INPUT_FILE = "chat.txt"
+OUTPUT_DIR = "by_authors"  # Correction : c'est un dossier
+FIGURES_DIR = "figures"
+TOP_N = 10  # Nombre d'auteurs à afficher dans les graphes globaux
+WORKERS = os.cpu_count() or 1  # Processus pour le parse et le rendu des figures (1 = série)
+INCREMENTAL_MODE = True  # Ne parse que les nouveaux messages si chat.txt n'a fait que grandir
+STATS_CUBE_FILE = "stats_cube.pkl"  # Cube de statistiques sauvegardé dans figures/
+AUTHOR_SHARD_TOKENS = None  # Ex: 2000 pour des shard_XXXX.txt par auteur, lus tels quels comme segments par l'IA (None = un seul all_messages.txt)
+MESSAGE_INDEX = False  # Index de recherche (.godvoice_cache/<chat>.index) à chaque changement ; sinon --ai-retrieval seulement
+TERM_MATRIX = False  # Vocabulaire des auteurs (.godvoice_cache/<chat>.terms) à chaque changement ; sinon --ai-vocabulary seulement
+
+# chat.txt format
+# 9/2/22, 19:37 - Gilles created group "Les instagrammeuses"
+# 9/2/22, 19:37 - You were added
+# 8/22/23, 18:26 - Mathieu . Jc: <Media omitted>
+# 8/22/23, 18:26 - Mathieu . Jc: 😆
+# 8/23/23, 12:50 - +33 6 78 52 49 66: J aime trop les bretons 😆
+# 8/23/23, 16:48 - AurelienS: <Media omitted>
+# 8/23/23, 16:49 - AurelienS: 39.5 pas mal
+
+# === Colonnes dérivées (toute modification doit incrémenter FEATURES_VERSION pour invalider le cache) ===
+FEATURES_VERSION = 6
+
+
+@dataclass
+class RunConfig:
+    input_file: str = INPUT_FILE
+    output_dir: str = OUTPUT_DIR
+    figures_dir: str = FIGURES_DIR
+    top_n: int = TOP_N
+    workers: int = WORKERS
+    incremental: bool = INCREMENTAL_MODE
+    author_shard_tokens: int = AUTHOR_SHARD_TOKENS
+    message_index: bool = MESSAGE_INDEX
+    term_matrix: bool = TERM_MATRIX
+
+
+@dataclass
+class ChatData:
+    df: pd.DataFrame
+    new_df: pd.DataFrame = None  # Messages ajoutés depuis le dernier run (mode incrémental)
+    cache_hit: bool = False
+    previous_digest: str = None  # Empreinte du chat au dernier run
+    digest: str = None  # Empreinte du chat actuel (celle du cache)
+
+
+@dataclass
+class ChatStats:
+    aggregates: dict
+    stats: pd.DataFrame  # nb_messages, nb_mots, moyenne_mots par auteur
+    digest: str = None
+
+    @property
+    def cube(self):
+        return self.aggregates['cube']
+
+
+def enrich_dataframe(df):
+    # Mots, heure, type de message (catégoriel), médias, liens, mentions et questions
+    add_text_features(df)
+    # Date brute gardée pour les fichiers par auteur ; le jour vient des timestamps du parser
+    # (format de date de l'export détecté une fois, dates uniques converties une seule fois)
+    df['date_texte'] = df['date']
+    timestamps = df['timestamp'].to_numpy()
+    days = np.where(timestamps == NAT, NAT, timestamps - timestamps % 86400)
+    df['date'] = pd.to_datetime(days.astype('datetime64[s]')).as_unit('us')
+    # Emojis
+    df['nb_emojis'] = emoji_counts(df['message'])
+    df['contient_emoji'] = df['nb_emojis'] > 0
+
+
+# === Étape 1 : Parse le fichier en colonnes, ou rechargement du cache si chat.txt n'a pas changé ===
+@span("parse")
+def load_chat(config):
+    with span("read_cache"):
+        df = load_cached_chat(config.input_file, FEATURES_VERSION)
+    previous_meta = load_cache_meta(config.input_file, FEATURES_VERSION)
+    previous_digest = previous_meta["digest"] if previous_meta else None
+    if df is not None:
+        print(f"✅ Chat rechargé depuis le cache ({len(df):,} messages)")
+        return ChatData(df, cache_hit=True, previous_digest=previous_digest, digest=previous_digest)
+
+    new_df = None
+    with span("incremental"):
+        appended = load_appended_chat(config.input_file, FEATURES_VERSION, enrich_dataframe) if config.incremental else None
+    if appended is not None:
+        df, new_df = appended
+        print(f"✅ Mode incrémental : {len(new_df):,} nouveaux messages ajoutés aux {len(df) - len(new_df):,} déjà analysés")
+    else:
+        with span("parse_file", workers=config.workers):
+            chat = parse_chat_file(config.input_file, workers=config.workers)
+        # DataFrame construit depuis les colonnes, enrichi une seule fois puis mis en cache
+        with span("enrich"):
+            df = chat.to_dataframe()
+            del chat
+            enrich_dataframe(df)
+        print(f"✅ {len(df):,} messages parsés ({df['author'].nunique()} auteurs)")
+    with span("save_cache"):
+        digest = save_cached_chat(config.input_file, FEATURES_VERSION, df)
+    return ChatData(df, new_df=new_df, previous_digest=previous_digest, digest=digest)
+
+
+# === Étape 2 : Crée les fichiers par auteur (un seul fichier par auteur, plus de chunks) ===
+def write_author_files(messages_df, config, mode="w"):
+    # Une seule passe chronologique ; mode="a" ajoute seulement les nouveaux messages
+    rows = zip(messages_df['author'], messages_df['date_texte'], messages_df['time'], messages_df['message'])
+    if config.author_shard_tokens:
+        author_lines = {}
+        for author, date, time, message in rows:
+            author_lines.setdefault(author, []).append(f"[{date} {time}] {message}\n")
+        write_author_shards(config.output_dir, author_lines, config.author_shard_tokens, mode=mode)
+        return
+    with AuthorFileWriter(config.output_dir, mode=mode) as writer:
+        for author, date, time, message in rows:
+            # Format: [YYYY-MM-DD HH:MM] message
+            writer.write(author, f"[{date} {time}] {message}\n")
+
+
+def _author_files_key(config, digest):
+    # Empreinte enregistrée pour by_authors/ : celle du chat, plus le budget des shards s'il y en a
+    # (changer AUTHOR_SHARD_TOKENS oblige à tout réécrire)
+    if digest is None or not config.author_shard_tokens:
+        return digest
+    return f"{digest}:shards{config.author_shard_tokens}"
+
+
+def author_files_current(config, digest):
+    # by_authors/ contient-il tous les messages du chat d'empreinte digest ?
+    return (digest is not None and Path(config.output_dir).exists()
+            and author_files_digest(config.input_file, FEATURES_VERSION, config.output_dir)
+            == _author_files_key(config, digest))
+
+
+@span("split")
+def split_authors(chat, config):
+    # Inutile de réécrire les fichiers s'ils ont déjà été écrits pour ce chat. L'empreinte enregistrée
+    # compte, pas le cache : parse ou stats ont pu absorber des messages ajoutés sans écrire by_authors/
+    if author_files_current(config, chat.digest):
+        return
+    written = author_files_digest(config.input_file, FEATURES_VERSION, config.output_dir)
+    if (chat.new_df is not None and Path(config.output_dir).exists()
+            and written == _author_files_key(config, chat.previous_digest)):
+        write_author_files(chat.new_df, config, mode="a")
+        print(f"✅ Nouveaux messages ajoutés dans le dossier '{config.output_dir}/'")
+    else:
+        write_author_files(chat.df, config)
+        print(f"✅ Fichiers générés dans le dossier '{config.output_dir}/' (un fichier par auteur)")
+    save_author_files_digest(config.input_file, FEATURES_VERSION, config.output_dir,
+                             _author_files_key(config, chat.digest))
+
+
+# === Étape 3 : Statistiques de base (agrégats fusionnés avec ceux du dernier run si possible) ===
+@span("stats")
+def compute_stats(chat, config):
+    aggregates = None
+    if chat.cache_hit or chat.new_df is not None:
+        aggregates = load_aggregates(config.input_file, chat.previous_digest)
+    if aggregates is None:
+        with span("aggregates"):
+            aggregates = compute_aggregates(chat.df)
+            save_aggregates(config.input_file, chat.digest, aggregates)
+    elif chat.new_df is not None:
+        with span("aggregates", incremental=True):
+            aggregates = merge_aggregates(aggregates, compute_aggregates(chat.new_df))
+            save_aggregates(config.input_file, chat.digest, aggregates)
+
+    # Index de recherche (--ai-retrieval) reconstruit en une passe quand le chat a changé (même empreinte que le cache).
+    # Coûteux sur un gros chat : jamais construit par défaut, pour que le mode incrémental reste incrémental
+    if config.message_index and not index_is_current(index_dir(config.input_file), chat.digest):
+        authors = chat.df['author'].cat
+        with span("index"):
+            message_index = build_index(index_dir(config.input_file), authors.categories, authors.codes.to_numpy(),
+                                        chat.df['timestamp'].to_numpy(), chat.df['message'], digest=chat.digest)
+        print(f"✅ Index de recherche construit ({len(message_index.terms):,} termes)")
+
+    # Matrice auteurs × termes (--ai-vocabulary : mots signature, expressions, proximité de vocabulaire), même règle
+    if config.term_matrix and not matrix_is_current(matrix_dir(config.input_file), chat.digest):
+        authors = chat.df['author'].cat
+        with span("term_matrix"):
+            term_matrix = build_term_matrix(matrix_dir(config.input_file), authors.categories, authors.codes.to_numpy(),
+                                            chat.df['message'], digest=chat.digest, workers=config.workers)
+        print(f"✅ Vocabulaire des auteurs calculé ({len(term_matrix):,} mots et expressions)")
+
+    return ChatStats(aggregates, stats_from_aggregates(aggregates), chat.digest)
+
+
+@span("cached_stats")
+def cached_stats(config):
+    # Statistiques du dernier run si chat.txt n'a pas changé depuis, sans recharger les messages
+    meta = current_cache_meta(config.input_file, FEATURES_VERSION)
+    if meta is None:
+        return None
+    aggregates = load_aggregates(config.input_file, meta["digest"])
+    if aggregates is None:
+        return None
+    print("✅ Statistiques rechargées depuis le cache")
+    return ChatStats(aggregates, stats_from_aggregates(aggregates), meta["digest"])
+
+
+def print_stats(chat_stats):
+    print("\n=== Statistiques par auteur (pandas) ===")
+    print(chat_stats.stats)
+    # Emojis préférés de chacun (table auteur x emoji, fusionnée comme les autres agrégats)
+    print("\n=== Stats rigolos ===")
+    emoji_table = chat_stats.aggregates['emoji_frequencies']
+    for author in chat_stats.stats['nb_messages'].sort_values(ascending=False).head(3).index:
+        favorites = ' '.join(f"{emoji} ({count})" for emoji, count in top_emojis(emoji_table, author))
+        print(f"  {author} : {favorites or 'aucun emoji'}")
+
+
+# === Étapes 4 et 5 : Données précalculées de chaque figure, puis rendu (une figure = un job) ===
+def figure_jobs(chat_stats, config):
+    from figures import (FigureJob, plot_communication_style, plot_daily_participation, plot_heatmap,
+                         plot_hourly_activity_top3, plot_hourly_distribution, plot_media_emoji, plot_message_types,
+                         plot_participation_pie, plot_top_authors_bar, plot_words_histogram)
+    from heatmaps import build_heatmaps
+
+    # Cube auteur x jour x heure x type : toutes les figures sont calculées depuis lui, sans revenir aux messages
+    cube, stats, top_n = chat_stats.cube, chat_stats.stats, config.top_n
+    daily_counts = cube.pivot('day', 'author')
+    hourly_counts = cube.pivot('hour', 'author')
+
+    # Top N des auteurs
+    top_authors = stats['nb_messages'].sort_values(ascending=False).head(top_n)
+    top_authors_list = top_authors.index.tolist()
+
+    # Participation dans le temps (par jour) et répartition horaire (par heure), top N auteurs
+    daily_counts_top = daily_counts[top_authors_list]
+    hourly_counts_top = hourly_counts[top_authors_list]
+
+    # Heatmaps : toutes les matrices (globale + une par auteur) et leurs vmax (95e percentile
+    # pour éviter les outliers) calculées en une seule passe depuis les agrégats quotidiens
+    heatmaps = build_heatmaps(daily_counts)
+
+    # 1. Distribution du nombre de mots par message (histogramme)
+    words_counts, words_edges = cube.words_histogram(bins=50)
+    words_mean, words_median = cube.words_mean_median()
+
+    # 2. Mots/message vs Nombre de messages (style de communication)
+    style_points = [(author, stats.loc[author, 'nb_messages'], stats.loc[author, 'moyenne_mots'])
+                    for author in top_authors_list]
+
+    # 3. Analyse messages courts vs longs
+    message_types = cube.pivot('author', 'type')
+    message_types_top = message_types.loc[top_authors_list]
+
+    # 4. Analyse des heures de pointe par auteur (top 3)
+    # Les messages sans heure valide sont écartés par le tableau croisé
+    top_3_authors = top_authors.head(3).index.tolist()
+    hourly_activity = cube.slice(author=top_3_authors).pivot('hour', 'author')
+
+    # 5. Analyse des médias et emojis
+    media_emoji_stats = cube.totals('author').rename(columns={
+        'nb_messages': 'total_messages',
+        'nb_media': 'messages_avec_media',
+        'nb_emoji_messages': 'messages_avec_emoji',
+    })[['total_messages', 'messages_avec_media', 'messages_avec_emoji']].reset_index()
+    media_emoji_stats['pct_media'] = (media_emoji_stats['messages_avec_media'] / media_emoji_stats['total_messages'] * 100).round(1)
+    media_emoji_stats['pct_emoji'] = (media_emoji_stats['messages_avec_emoji'] / media_emoji_stats['total_messages'] * 100).round(1)
+    # Pourcentages médias/emojis pour le top 10
+    media_emoji_top = media_emoji_stats[media_emoji_stats['author'].isin(top_authors_list)]
+
+    def figure_path(filename):
+        return os.path.join(config.figures_dir, filename)
+
+    jobs = [
+        FigureJob('messages_par_auteur_top', plot_top_authors_bar, figure_path('messages_par_auteur_top.png'),
+                  {'top_authors': top_authors, 'top_n': top_n}),
+        FigureJob('participation_quotidienne_top', plot_daily_participation, figure_path('participation_quotidienne_top.png'),
+                  {'daily_counts_top': daily_counts_top, 'top_n': top_n}),
+        FigureJob('repartition_horaire_top', plot_hourly_distribution, figure_path('repartition_horaire_top.png'),
+                  {'hourly_counts_top': hourly_counts_top, 'top_n': top_n}),
+        FigureJob('pourcentage_participation_top', plot_participation_pie, figure_path('pourcentage_participation_top.png'),
+                  {'top_authors': top_authors, 'top_n': top_n}),
+        FigureJob('heatmap_github_global', plot_heatmap, figure_path('heatmap_github_global.png'),
+                  {'matrix': heatmaps.global_frame(), 'vmax': heatmaps.global_vmax,
+                   'title': f'Heatmap de participation par jour (global, échelle non-linéaire: 0-{heatmaps.global_vmax})'}),
+        FigureJob('distribution_mots_par_message', plot_words_histogram, figure_path('distribution_mots_par_message.png'),
+                  {'counts': words_counts, 'edges': words_edges,
+                   'mean': words_mean, 'median': words_median}),
+        FigureJob('style_communication', plot_communication_style, figure_path('style_communication.png'),
+                  {'points': style_points}),
+        FigureJob('types_messages', plot_message_types, figure_path('types_messages.png'),
+                  {'message_types_top': message_types_top}),
+        FigureJob('activite_horaire_top3', plot_hourly_activity_top3, figure_path('activite_horaire_top3.png'),
+                  {'hourly_activity': hourly_activity}),
+        FigureJob('medias_emojis', plot_media_emoji, figure_path('medias_emojis.png'),
+                  {'media_emoji_top': media_emoji_top}),
+    ]
+
+    # Heatmap par personne
+    heatmaps_dir = os.path.join(config.figures_dir, 'heatmaps_par_auteur')
+    for author in stats.index:
+        author_heatmap_matrix, author_vmax = heatmaps.author_frame(author)
+        safe_author = str(author).replace('/', '_').replace(' ', '_')
+        jobs.append(FigureJob(
+            f'heatmap_{safe_author}', plot_heatmap, os.path.join(heatmaps_dir, f'heatmap_{safe_author}.png'),
+            {'matrix': author_heatmap_matrix, 'vmax': author_vmax,
+             'title': f'Heatmap de participation pour {author} (échelle non-linéaire: 0-{author_vmax})'}))
+    return jobs
+
+
+@span("figures")
+def render_all_figures(chat_stats, config, only=None, force=False):
+    from figures import MANIFEST_NAME, render_figures
+
+    os.makedirs(os.path.join(config.figures_dir, 'heatmaps_par_auteur'), exist_ok=True)
+    # Cube sauvegardé pour des requêtes rapides hors du script : StatsCube.load(...).slice(author=..., period=...)
+    chat_stats.cube.save(os.path.join(config.figures_dir, STATS_CUBE_FILE))
+    chat_stats.aggregates['emoji_frequencies'].to_csv(os.path.join(config.figures_dir, 'emojis_par_auteur.csv'))
+
+    with span("figure_data"):
+        jobs = figure_jobs(chat_stats, config)
+    print(f"\n=== Rendu de {len(jobs)} figures ({config.workers} processus) ===")
+    render_figures(jobs, config.workers, manifest_path=os.path.join(config.figures_dir, MANIFEST_NAME),
+                   only=only, force=force)
+    print("✅ Graphiques rigolos générés !")
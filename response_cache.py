@@ -0,0 +1,91 @@
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+
+from chat_cache import CACHE_DIR
+
+RESPONSE_CACHE_NAME = "ai_responses.sqlite"
+
+
+def response_key(model, max_tokens, *parts):
+    # Empreinte d'un appel : modèle, max_tokens et ce qui définit le prompt
+    # (version du gabarit, auteur, texte du segment...)
+    digest = hashlib.blake2b(digest_size=20)
+    for part in (model, max_tokens, *parts):
+        data = str(part).encode("utf-8")
+        # Longueur en préfixe : ("ab", "c") et ("a", "bc") donnent des clés différentes
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    # Réponses de l'API Messages gardées sur disque (SQLite), pour ne payer qu'une fois
+    # chaque segment. Éviction des entrées trop vieilles, puis des moins récemment
+    # utilisées si le cache dépasse max_bytes.
+    def __init__(self, path=None, max_age_days=None, max_bytes=None):
+        self.path = Path(path) if path else Path(CACHE_DIR) / RESPONSE_CACHE_NAME
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._db = sqlite3.connect(self.path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, text TEXT NOT NULL, input_tokens INTEGER, output_tokens INTEGER,"
+            " size INTEGER NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.evict()
+
+    def get(self, key):
+        row = self._db.execute("SELECT text FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self._db:
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def __contains__(self, key):
+        # Sans toucher aux compteurs ni à la date d'utilisation
+        return self._db.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is not None
+
+    def put(self, key, text, input_tokens=0, output_tokens=0):
+        now = time.time()
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, text, input_tokens, output_tokens, len(text.encode("utf-8")), now, now),
+            )
+
+    def evict(self):
+        # Renvoie le nombre d'entrées supprimées
+        removed = 0
+        with self._db:
+            if self.max_age_days is not None:
+                cutoff = time.time() - self.max_age_days * 86400
+                removed += self._db.execute("DELETE FROM responses WHERE created < ?", (cutoff,)).rowcount
+            if self.max_bytes is not None:
+                # On garde les plus récemment utilisées tant que leur taille cumulée tient
+                removed += self._db.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    " SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY last_used DESC, key) AS total"
+                    " FROM responses) WHERE total > ?)",
+                    (self.max_bytes,),
+                ).rowcount
+        return removed
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
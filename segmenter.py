@@ -0,0 +1,74 @@
+import codecs
+from functools import lru_cache
+
+import numpy as np
+
+# Tokenizer d'OpenAI utilisé comme estimation : assez proche de celui de Claude pour dimensionner les segments
+ENCODING_NAME = "cl100k_base"
+CHARS_PER_TOKEN = 4  # Estimation de secours si l'encodage n'est pas disponible
+
+
+@lru_cache(maxsize=None)
+def get_encoder():
+    # Chargé une seule fois par processus (le chargement coûte bien plus cher qu'un encodage).
+    # tiktoken télécharge l'encodage au premier usage : hors ligne, on se rabat sur une estimation
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(ENCODING_NAME)
+    except Exception as e:
+        print(f"⚠️  Encodage {ENCODING_NAME} indisponible ({type(e).__name__}), tokens estimés à 1 pour {CHARS_PER_TOKEN} caractères")
+        return None
+
+
+def count_tokens(text):
+    encoder = get_encoder()
+    if encoder is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoder.encode_ordinary(text))
+
+
+def count_tokens_batch(texts):
+    # Tous les textes encodés d'un coup (tiktoken répartit le lot sur plusieurs threads)
+    texts = list(texts)
+    encoder = get_encoder()
+    if encoder is None:
+        return -(-np.fromiter(map(len, texts), dtype=np.int64, count=len(texts)) // CHARS_PER_TOKEN)
+    return np.fromiter(map(len, encoder.encode_ordinary_batch(texts)), dtype=np.int64, count=len(texts))
+
+
+def split_long_line(line, budget):
+    # Un message trop long pour un segment est coupé sur des frontières de tokens,
+    # sans couper un caractère UTF-8 en deux ni perdre de texte
+    encoder = get_encoder()
+    if encoder is None:
+        size = budget * CHARS_PER_TOKEN
+        return [line[i:i + size] for i in range(0, len(line), size)]
+    tokens = encoder.encode_ordinary(line)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pieces = []
+    for start in range(0, len(tokens), budget):
+        piece = decoder.decode(encoder.decode_bytes(tokens[start:start + budget]),
+                               final=start + budget >= len(tokens))
+        if piece:
+            pieces.append(piece)
+    return pieces
+
+
+def pack_segments(lines, budget):
+    # Regroupe des lignes entières "[date heure] message\n" en segments d'au plus budget tokens,
+    # en remplissant chaque segment au maximum. Un ajout en fin de liste ne change que le
+    # dernier segment : les précédents restent identiques (et donc en cache).
+    segments = []
+    current, current_tokens = [], 0
+    for line, tokens in zip(lines, count_tokens_batch(lines)):
+        pieces = split_long_line(line, budget) if tokens > budget else [line]
+        for piece in pieces:
+            piece_tokens = tokens if len(pieces) == 1 else count_tokens(piece)
+            if current and current_tokens + piece_tokens > budget:
+                segments.append("".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        segments.append("".join(current))
+    return segments
@@ -0,0 +1,113 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+DIMENSIONS = ['author', 'day', 'hour', 'type']
+MEASURES = ['nb_messages', 'nb_mots', 'nb_media', 'nb_emoji_messages', 'nb_emojis']
+
+
+@dataclass
+class StatsCube:
+    # Agrégats auteur x jour x heure x type de message, une ligne par case non vide :
+    # nombre de messages, de mots, de messages avec média, de messages avec emoji, d'emojis.
+    # word_counts (auteur, nombre de mots) -> nombre de messages garde la distribution
+    # des longueurs pour l'histogramme, sans revenir au texte.
+    cells: pd.DataFrame
+    word_counts: pd.Series
+
+    # === Construction ===
+    @classmethod
+    def from_messages(cls, df):
+        # Une seule passe groupby sur les colonnes déjà enrichies (jamais sur le texte)
+        keys = pd.DataFrame({
+            'author': df['author'].astype(str),
+            'day': df['date'],
+            'hour': df['hour'],
+            'type': df['type_message'],
+        })
+        values = pd.DataFrame({
+            'nb_messages': np.ones(len(df), dtype=np.int64),
+            'nb_mots': df['nb_mots'].astype(np.int64),
+            'nb_media': df['contient_media'].astype(np.int64),
+            'nb_emoji_messages': df['contient_emoji'].astype(np.int64),
+            'nb_emojis': df['nb_emojis'].astype(np.int64),
+        })
+        cells = pd.concat([keys, values], axis=1)
+        word_counts = df.groupby([keys['author'], df['nb_mots'].astype(np.int64)]).size()
+        return cls(cls._collapse(cells), word_counts.rename_axis(['author', 'nb_mots']))
+
+    @staticmethod
+    def _collapse(cells):
+        # dropna=False : les messages sans date ou sans heure valides comptent dans les totaux
+        return cells.groupby(DIMENSIONS, observed=True, dropna=False, sort=True)[MEASURES].sum().reset_index()
+
+    def merge(self, delta):
+        # Cube des anciens messages + cube des nouveaux = cube de l'ensemble (mode incrémental)
+        cells = pd.concat([self.cells, delta.cells], ignore_index=True)
+        word_counts = self.word_counts.add(delta.word_counts, fill_value=0).astype(np.int64).sort_index()
+        return StatsCube(self._collapse(cells), word_counts)
+
+    # === Requêtes ===
+    def slice(self, author=None, period=None, hour=None, type=None):
+        # author : un nom ou une liste ; period : "2024", "2024-03", "2024-03-15" ou (début, fin) inclus ;
+        # hour : une heure ou une liste ; type : un libellé de type_message ou une liste
+        mask = np.ones(len(self.cells), dtype=bool)
+        words_mask = np.ones(len(self.word_counts), dtype=bool)
+        if author is not None:
+            authors = [author] if isinstance(author, str) else list(author)
+            mask &= self.cells['author'].isin(authors).to_numpy()
+            words_mask &= self.word_counts.index.get_level_values('author').isin(authors)
+        if period is not None:
+            if isinstance(period, str):
+                span = pd.Period(period)
+                start, end = span.start_time, span.end_time
+            else:
+                start, end = pd.Timestamp(period[0]), pd.Timestamp(period[1])
+            mask &= self.cells['day'].between(start, end).to_numpy()
+        if hour is not None:
+            mask &= self.cells['hour'].isin(np.atleast_1d(hour)).fillna(False).to_numpy(dtype=bool)
+        if type is not None:
+            mask &= self.cells['type'].isin([type] if isinstance(type, str) else list(type)).to_numpy()
+        if period is not None or hour is not None or type is not None:
+            # La distribution des longueurs n'est gardée que par auteur : un filtre sur
+            # d'autres dimensions la rend indisponible plutôt que fausse
+            words_mask[:] = False
+        return StatsCube(self.cells[mask].reset_index(drop=True), self.word_counts[words_mask])
+
+    def totals(self, by='author'):
+        # Sommes de toutes les mesures par dimension(s), ex: totals('author'), totals(['author', 'type'])
+        return self.cells.groupby(by, observed=True)[MEASURES].sum()
+
+    def pivot(self, index, columns, measure='nb_messages'):
+        # Tableau croisé d'une mesure, ex: pivot('day', 'author') = messages par jour et par auteur
+        return self.cells.groupby([index, columns], observed=True)[measure].sum().unstack(fill_value=0)
+
+    def words_per_message(self):
+        # Nombre de mots de chaque message possible -> nombre de messages (tous auteurs confondus)
+        return self.word_counts.groupby(level='nb_mots').sum()
+
+    def words_histogram(self, bins=50):
+        distribution = self.words_per_message()
+        counts, edges = np.histogram(distribution.index.to_numpy(), bins=bins, weights=distribution.to_numpy())
+        return counts.astype(np.int64), edges
+
+    def words_mean_median(self):
+        distribution = self.words_per_message()
+        values, weights = distribution.index.to_numpy(), distribution.to_numpy()
+        total = weights.sum()
+        mean = (values * weights).sum() / total
+        # Médiane comme pandas : moyenne des deux valeurs centrales si le total est pair
+        cumulative = np.cumsum(weights)
+        low = values[np.searchsorted(cumulative, (total - 1) // 2 + 1)]
+        high = values[np.searchsorted(cumulative, total // 2 + 1)]
+        return mean, (low + high) / 2
+
+    # === Sauvegarde ===
+    def save(self, path):
+        pd.to_pickle({'cells': self.cells, 'word_counts': self.word_counts}, path)
+
+    @classmethod
+    def load(cls, path):
+        saved = pd.read_pickle(path)
+        return cls(saved['cells'], saved['word_counts'])
@@ -0,0 +1,102 @@
+# Générateur d'exports WhatsApp synthétiques (même format que les vrais, voir le haut de pipeline.py),
+# pour les benchmarks et pour tester sans conversation réelle :
+#   python synthetic_chat.py bench.txt --messages 1000000 --authors 12 --date-format fr
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Formats d'en-tête reconnus par chat_parser.py
+DATE_FORMATS = {
+    'android': lambda t: f"{t.month}/{t.day}/{t:%y}, {t:%H:%M} - ",
+    'fr': lambda t: f"{t:%d/%m/%Y} {t:%H:%M} - ",
+    '12h': lambda t: f"{t.month}/{t.day}/{t:%y}, {t.hour % 12 or 12}:{t:%M} {'PM' if t.hour >= 12 else 'AM'} - ",
+    'ios': lambda t: f"[{t:%d/%m/%Y}, {t:%H:%M:%S}] ",
+}
+
+VOCABULARY = """
+    le la les de des un une et est pas que qui en du au on ça va bien trop grave mdr ptdr lol jpp
+    vote gauche droite macron gouvernement impôts grève politique fake news vrai faux rumeur source
+    drôle clash nul génial sérieux jamais toujours catastrophe incroyable pire meme photo vidéo
+    demain ce soir resto apéro match week-end vacances boulot réunion train retard pluie soleil
+    chat chien bébé anniversaire cadeau musique film série jeu foot rugby vélo plage montagne
+""".split()
+EMOJIS = ["😆", "😂", "❤️", "👍🏽", "🇫🇷", "🤣", "🙄", "🔥", "😭", "🤔"]
+MEDIA_PLACEHOLDER = "<Media omitted>"
+START_DATE = datetime(2019, 1, 1, 8, 0)
+BLOCK_SIZE = 100_000  # Messages tirés d'un coup (numpy) avant d'être écrits
+
+
+def author_names(n_authors):
+    # Quelques prénoms puis des numéros de téléphone, comme dans un vrai groupe
+    names = ["Gis", "AurelienS", "Mathieu . Jc", "Gilles", "Zoé", "Camille", "Léa", "Hugo", "Inès", "Noah"]
+    return [names[i] if i < len(names) else f"+33 6 {i // 100 % 100:02d} {i % 100:02d} 00 {i % 7:02d}"
+            for i in range(n_authors)]
+
+
+def generate_chat(path, n_messages, n_authors=6, multiline_ratio=0.05, media_rate=0.08, emoji_rate=0.3,
+                  date_format='android', seed=0, mean_gap_minutes=None):
+    # Écrit un export de n_messages messages en un seul flux (quelques Mo de mémoire, même à 10M messages).
+    # Auteurs tirés selon une loi de Zipf (quelques gros bavards, beaucoup de discrets),
+    # 1 à 30 mots par message, heures de la journée réalistes. Renvoie le nombre d'octets écrits.
+    rng = np.random.default_rng(seed)
+    format_header = DATE_FORMATS[date_format]
+    authors = author_names(n_authors)
+    weights = 1 / np.arange(1, n_authors + 1)
+    weights /= weights.sum()
+    # Écart moyen entre deux messages : le chat couvre ~5 ans quelle que soit sa taille
+    mean_gap = mean_gap_minutes or max(5 * 365 * 24 * 60 / max(n_messages, 1), 0.05)
+    vocabulary = np.array(VOCABULARY)
+    t = START_DATE
+    written = 0
+    with open(path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        for start in range(0, n_messages, BLOCK_SIZE):
+            size = min(BLOCK_SIZE, n_messages - start)
+            author_ids = rng.choice(n_authors, size=size, p=weights)
+            word_counts = np.minimum(rng.geometric(0.12, size=size), 30)
+            gaps = rng.exponential(mean_gap, size=size)
+            is_media = rng.random(size) < media_rate
+            has_emoji = rng.random(size) < emoji_rate
+            is_multiline = rng.random(size) < multiline_ratio
+            emojis = rng.choice(len(EMOJIS), size=size)
+            words = vocabulary[rng.integers(len(vocabulary), size=int(word_counts.sum()))].tolist()
+            lines = []
+            position = 0
+            for i in range(size):
+                t += timedelta(minutes=float(gaps[i]))
+                # La nuit, le groupe dort : on saute à 8h
+                if t.hour < 8:
+                    t = t.replace(hour=8)
+                count = int(word_counts[i])
+                if is_media[i]:
+                    message = MEDIA_PLACEHOLDER
+                else:
+                    message = " ".join(words[position:position + count])
+                    if is_multiline[i] and count > 3:
+                        # Message sur plusieurs lignes : la suite est une ligne sans en-tête
+                        cut = count // 2
+                        message = " ".join(words[position:position + cut]) + "\n" + " ".join(words[position + cut:position + count])
+                    if has_emoji[i]:
+                        message += " " + EMOJIS[emojis[i]]
+                position += count
+                lines.append(f"{format_header(t)}{authors[author_ids[i]]}: {message}\n")
+            block = "".join(lines)
+            f.write(block)
+            written += len(block.encode("utf-8"))
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère un export WhatsApp synthétique")
+    parser.add_argument('output', help="Fichier à écrire (ex: bench.txt)")
+    parser.add_argument('--messages', type=int, default=10_000)
+    parser.add_argument('--authors', type=int, default=6)
+    parser.add_argument('--multiline', type=float, default=0.05, help="Part des messages sur plusieurs lignes")
+    parser.add_argument('--media', type=float, default=0.08, help="Part des messages '<Media omitted>'")
+    parser.add_argument('--emoji', type=float, default=0.3, help="Part des messages avec un emoji")
+    parser.add_argument('--date-format', choices=sorted(DATE_FORMATS), default='android')
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args()
+    size = generate_chat(options.output, options.messages, options.authors, options.multiline, options.media,
+                         options.emoji, options.date_format, options.seed)
+    print(f"✅ {options.messages:,} messages écrits dans {options.output} ({size / 1e6:.1f} Mo)")
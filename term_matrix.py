@@ -0,0 +1,319 @@
+# Matrice creuse auteurs × termes (mots et paires de mots) : combien de fois chaque auteur a
+# employé chaque terme, calculée en une passe sur les messages et sauvegardée sur disque (lecture en mmap).
+# Requêtes instantanées, sans relire les messages :
+#   python term_matrix.py top chat.txt Gis              # mots et expressions les plus utilisés
+#   python term_matrix.py signature chat.txt Gis        # mots signature (TF-IDF : propres à l'auteur)
+#   python term_matrix.py similar chat.txt Gis          # auteurs au vocabulaire le plus proche
+import argparse
+import json
+import os
+import re
+import shutil
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from chat_cache import CACHE_DIR, cache_path, file_digest
+from chat_parser import pool_context
+from message_index import STOPWORDS, TOKEN_REGEX, normalize
+from text_features import MEDIA_PLACEHOLDER, URL_REGEX
+
+MATRIX_VERSION = 1
+MATRIX_SUFFIX = ".terms"
+MIN_COUNT = 2  # Termes employés moins de MIN_COUNT fois dans tout le chat ignorés (fautes de frappe, hapax)
+SIGNATURE_MIN_COUNT = 3  # Un mot signature doit revenir au moins 3 fois chez l'auteur
+PARALLEL_MIN_MESSAGES = 200_000  # En dessous, le démarrage du pool coûte plus que le comptage série
+CHUNKS_PER_WORKER = 4
+
+_URLS = re.compile(URL_REGEX)
+
+
+def matrix_dir(input_file, cache_dir=CACHE_DIR):
+    return cache_path(input_file, MATRIX_SUFFIX, cache_dir)
+
+
+# === Construction : comptage par morceaux (en parallèle), fusion, puis écriture ===
+def count_terms(author_codes, messages, n_authors):
+    # Comptes (terme, auteur) d'un morceau de messages et son vocabulaire local.
+    # Termes : mots hors mots vides, et paires de mots consécutifs d'un même message sauf si les
+    # deux sont des mots vides ("de ouf" est gardé, "c est" non). Liens et médias ignorés.
+    # Seule la boucle de découpage est en Python : chaque mot distinct est interné une fois
+    # (puis normalisé une fois), paires et comptes sont calculés en numpy sur tout le morceau.
+    tokens = {}
+    token_ids = array("i")
+    lengths = array("i")
+    for message in messages:
+        if not isinstance(message, str) or message == MEDIA_PLACEHOLDER:
+            lengths.append(0)
+            continue
+        if "http" in message or "www." in message:
+            message = _URLS.sub(" ", message)
+        ids = [tokens.setdefault(token, len(tokens)) for token in TOKEN_REGEX.findall(message.casefold())]
+        token_ids.extend(ids)
+        lengths.append(len(ids))
+
+    # Mots normalisés (accents) : "ça" et "ca" deviennent le même mot
+    words = {}
+    normalized = np.fromiter((words.setdefault(normalize(token), len(words)) for token in tokens),
+                             dtype=np.int64, count=len(tokens))
+    words = list(words)
+    n_words = len(words)
+    is_stopword = np.fromiter((word in STOPWORDS for word in words), dtype=bool, count=n_words)
+    ids = normalized[np.frombuffer(token_ids, dtype=np.int32)]
+    lengths = np.frombuffer(lengths, dtype=np.int32)
+    authors = np.repeat(np.asarray(author_codes, dtype=np.int64), lengths)
+
+    # Clés : mot = id du mot ; paire = n_words + premier * n_words + second
+    unigrams = ~is_stopword[ids]
+    same_message = np.ones(len(ids), dtype=bool)
+    same_message[np.cumsum(lengths)[lengths > 0] - 1] = False  # Dernier mot de chaque message
+    first, second = ids[:-1], ids[1:]
+    bigrams = same_message[:-1] & ~(is_stopword[first] & is_stopword[second])
+    term_keys = np.concatenate([ids[unigrams], n_words + first[bigrams] * n_words + second[bigrams]])
+    term_authors = np.concatenate([authors[unigrams], authors[:-1][bigrams]])
+
+    keys, counts = np.unique(term_keys * n_authors + term_authors, return_counts=True)
+    term_keys, term_authors = keys // n_authors, keys % n_authors
+    used, term_ids = np.unique(term_keys, return_inverse=True)
+    terms = [words[key] if key < n_words else f"{words[(key - n_words) // n_words]} {words[(key - n_words) % n_words]}"
+             for key in used.tolist()]
+    return terms, term_ids, term_authors, counts
+
+
+def merge_counts(parts, n_authors):
+    # Vocabulaires des morceaux fusionnés en un seul, comptes (terme, auteur) additionnés
+    if len(parts) == 1:
+        return parts[0]
+    vocabulary = {}
+    term_ids, authors, counts = [], [], []
+    for terms, part_terms, part_authors, part_counts in parts:
+        global_ids = np.fromiter((vocabulary.setdefault(term, len(vocabulary)) for term in terms),
+                                 dtype=np.int64, count=len(terms))
+        term_ids.append(global_ids[part_terms])
+        authors.append(part_authors)
+        counts.append(part_counts)
+    keys, inverse = np.unique(np.concatenate(term_ids) * n_authors + np.concatenate(authors), return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate(counts)).astype(np.int64)
+    return list(vocabulary), keys // n_authors, keys % n_authors, counts
+
+
+def _count_chunk(args):
+    return count_terms(*args)
+
+
+def build_term_matrix(path, authors, author_codes, messages, digest=None, workers=1, min_count=MIN_COUNT):
+    n_authors = max(len(authors), 1)
+    author_codes = np.asarray(author_codes)
+    messages = messages.tolist() if hasattr(messages, "tolist") else list(messages)
+    if workers > 1 and len(messages) >= PARALLEL_MIN_MESSAGES and pool_context() is not None:
+        bounds = np.linspace(0, len(messages), workers * CHUNKS_PER_WORKER + 1).astype(int)
+        chunks = [(author_codes[start:end], messages[start:end], n_authors) for start, end in zip(bounds[:-1], bounds[1:])]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as pool:
+            parts = list(pool.map(_count_chunk, chunks))
+    else:
+        parts = [count_terms(author_codes, messages, n_authors)]
+    terms, term_ids, rows, counts = merge_counts(parts, n_authors)
+    del parts
+
+    # Termes trop rares écartés ; vocabulaire trié (mots puis paires de mots) pour des ids stables
+    totals = np.bincount(term_ids, weights=counts, minlength=len(terms))
+    kept = np.flatnonzero(totals >= min_count)
+    order = sorted(kept.tolist(), key=lambda term_id: (" " in terms[term_id], terms[term_id]))
+    new_ids = np.full(len(terms), -1, dtype=np.int64)
+    new_ids[order] = np.arange(len(order))
+    keep = new_ids[term_ids] >= 0
+    columns, rows, counts = new_ids[term_ids[keep]], rows[keep], counts[keep]
+    vocabulary = [terms[term_id] for term_id in order]
+    n_unigrams = sum(" " not in term for term in vocabulary)
+    del terms, term_ids
+
+    # Format CSR : lignes = auteurs, colonnes = termes triés dans chaque ligne
+    by_row = np.lexsort((columns, rows))
+    columns, rows, counts = columns[by_row].astype(np.int32), rows[by_row], counts[by_row].astype(np.int32)
+    indptr = np.searchsorted(rows, np.arange(n_authors + 1)).astype(np.int64)
+
+    # TF-IDF (un auteur = un document) normalisé : poids des mots signature et similarité cosinus
+    doc_freq = np.bincount(columns, minlength=len(vocabulary)).astype(np.int32)
+    idf = np.log((1 + n_authors) / (1 + doc_freq)) + 1
+    weights = (1 + np.log(counts)) * idf[columns]
+    norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=n_authors))
+    weights = (weights / np.where(norms > 0, norms, 1)[rows]).astype(np.float32)
+    similarity = author_similarity(columns, weights, rows, doc_freq, n_authors)
+
+    tmp_path = Path(f"{path}.tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+    encoded = [term.encode("utf-8") for term in vocabulary]
+    term_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(term) for term in encoded], out=term_offsets[1:])
+    (tmp_path / "terms.bin").write_bytes(b"".join(encoded))
+    np.save(tmp_path / "term_offsets.npy", term_offsets)
+    np.save(tmp_path / "indptr.npy", indptr)
+    np.save(tmp_path / "indices.npy", columns)
+    np.save(tmp_path / "counts.npy", counts)
+    np.save(tmp_path / "weights.npy", weights)
+    np.save(tmp_path / "doc_freq.npy", doc_freq)
+    np.save(tmp_path / "similarity.npy", similarity)
+    meta = {
+        "version": MATRIX_VERSION,
+        "digest": digest,
+        "n_messages": len(messages),
+        "authors": [str(author) for author in authors],
+        "n_terms": len(vocabulary),
+        "n_unigrams": n_unigrams,
+        "min_count": min_count,
+    }
+    (tmp_path / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+    # Remplacement d'un bloc : une matrice à moitié écrite n'est jamais lue
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    return TermMatrix(path)
+
+
+def author_similarity(columns, weights, rows, doc_freq, n_authors):
+    # Cosinus entre les lignes TF-IDF normalisées ; seuls les termes partagés par au moins deux
+    # auteurs comptent dans les produits scalaires, les autres sont écartés avant le calcul
+    shared = doc_freq[columns] > 1
+    columns, weights, rows = columns[shared], weights[shared], rows[shared]
+    starts = np.searchsorted(rows, np.arange(n_authors + 1))
+    dense = np.zeros(len(doc_freq), dtype=np.float32)
+    similarity = np.eye(n_authors, dtype=np.float32)
+    for author in range(n_authors):
+        start, end = starts[author], starts[author + 1]
+        if start == end:
+            continue
+        dense[columns[start:end]] = weights[start:end]
+        similarity[author] = np.bincount(rows, weights=dense[columns] * weights, minlength=n_authors)
+        dense[columns[start:end]] = 0
+    return similarity
+
+
+def matrix_is_current(path, digest):
+    meta_path = Path(path) / "meta.json"
+    if digest is None or not meta_path.exists():
+        return False
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    return meta.get("version") == MATRIX_VERSION and meta.get("digest") == digest
+
+
+# === Requêtes ===
+class TermMatrix:
+    def __init__(self, path):
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        self.authors = meta["authors"]
+        self.n_unigrams = meta["n_unigrams"]
+        self.n_messages = meta["n_messages"]
+        self._author_codes = {author: i for i, author in enumerate(self.authors)}
+        load = lambda name: np.load(path / name, mmap_mode="r")  # noqa: E731
+        self.term_offsets = load("term_offsets.npy")
+        self.indptr = load("indptr.npy")
+        self.indices = load("indices.npy")
+        self.counts = load("counts.npy")
+        self.weights = load("weights.npy")
+        self.doc_freq = load("doc_freq.npy")
+        self.similarity = load("similarity.npy")
+        self._terms = np.memmap(path / "terms.bin", dtype=np.uint8, mode="r") if self.term_offsets[-1] else b""
+
+    def __len__(self):
+        return len(self.doc_freq)
+
+    def term(self, term_id):
+        start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+        return bytes(self._terms[start:end]).decode("utf-8")
+
+    def _row(self, author):
+        code = self._author_codes.get(author)
+        if code is None:
+            raise KeyError(f"Auteur inconnu : {author}")
+        start, end = self.indptr[code], self.indptr[code + 1]
+        return self.indices[start:end], self.counts[start:end], self.weights[start:end]
+
+    def _best(self, term_ids, scores, k):
+        # k meilleurs scores sans trier toute la ligne ; à score égal, ordre alphabétique des termes
+        if len(scores) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            term_ids, scores = term_ids[best], scores[best]
+        order = np.lexsort((term_ids, -scores))
+        return [(self.term(term_id), score.item()) for term_id, score in zip(term_ids[order], scores[order])]
+
+    def top_terms(self, author, k=20, kind=None):
+        # Termes les plus employés par l'auteur ; kind : "word" (mots) ou "bigram" (paires de mots)
+        term_ids, counts, _ = self._row(author)
+        term_ids, counts = np.asarray(term_ids), np.asarray(counts)
+        if kind is not None:
+            keep = term_ids < self.n_unigrams if kind == "word" else term_ids >= self.n_unigrams
+            term_ids, counts = term_ids[keep], counts[keep]
+        return self._best(term_ids, counts, k)
+
+    def signature(self, author, k=20, min_count=SIGNATURE_MIN_COUNT):
+        # Mots signature : TF-IDF élevé, c'est-à-dire fréquents chez l'auteur et rares chez les autres
+        term_ids, counts, weights = (np.asarray(column) for column in self._row(author))
+        keep = counts >= min_count
+        return self._best(term_ids[keep], weights[keep], k)
+
+    def similar_authors(self, author, k=5):
+        # Auteurs au vocabulaire le plus proche (cosinus des profils TF-IDF, entre 0 et 1)
+        if author not in self._author_codes:
+            raise KeyError(f"Auteur inconnu : {author}")
+        code = self._author_codes[author]
+        scores = np.array(self.similarity[code])
+        scores[code] = -1
+        order = np.argsort(-scores, kind="stable")[:k]
+        return [(self.authors[other], float(scores[other])) for other in order if scores[other] > 0]
+
+    def describe_author(self, author, k=10):
+        # Résumé court du vocabulaire de l'auteur, en contexte des prompts IA
+        if author not in self._author_codes:
+            return None
+        lines = [
+            "Mots les plus utilisés : " + ", ".join(term for term, _ in self.top_terms(author, k, kind="word")),
+            "Expressions favorites : " + ", ".join(term for term, _ in self.top_terms(author, k, kind="bigram")),
+            "Mots signature (propres à cet auteur) : " + ", ".join(term for term, _ in self.signature(author, k)),
+        ]
+        similar = self.similar_authors(author, 3)
+        if similar:
+            lines.append("Vocabulaire le plus proche de : " + ", ".join(f"{other} ({score:.2f})" for other, score in similar))
+        return "\n".join(lines)
+
+
+def build_term_matrix_for_chat(input_file, cache_dir=CACHE_DIR, workers=1):
+    from chat_parser import parse_chat_file
+
+    chat = parse_chat_file(input_file, workers=workers)
+    return build_term_matrix(matrix_dir(input_file, cache_dir), chat.authors, chat.author_codes, chat.messages(),
+                             digest=file_digest(input_file), workers=workers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vocabulaire des auteurs d'un export WhatsApp")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="(Re)construire la matrice auteurs × termes")
+    build_parser.add_argument("chat", nargs="?", default="chat.txt")
+    for name, help_text in (("top", "Mots et expressions les plus utilisés par un auteur"),
+                            ("signature", "Mots signature d'un auteur (TF-IDF)"),
+                            ("similar", "Auteurs au vocabulaire le plus proche")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("chat")
+        command.add_argument("author")
+        command.add_argument("-k", type=int, default=20)
+    options = parser.parse_args()
+
+    path = matrix_dir(options.chat)
+    if options.command == "build" or not matrix_is_current(path, file_digest(options.chat)):
+        matrix = build_term_matrix_for_chat(options.chat, workers=os.cpu_count() or 1)
+        print(f"✅ Matrice construite : {len(matrix.authors)} auteurs × {len(matrix):,} termes ({path})")
+    matrix = TermMatrix(path)
+    if options.command == "top":
+        for kind, title in (("word", "Mots"), ("bigram", "Expressions")):
+            print(f"=== {title} ===")
+            for term, count in matrix.top_terms(options.author, options.k, kind=kind):
+                print(f"{count:8,}  {term}")
+    elif options.command == "signature":
+        for term, score in matrix.signature(options.author, options.k):
+            print(f"{score:6.3f}  {term}")
+    elif options.command == "similar":
+        for other, score in matrix.similar_authors(options.author, options.k):
+            print(f"{score:6.3f}  {other}")
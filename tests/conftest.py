@@ -0,0 +1,5 @@
+# Les modules du projet sont à la racine du dépôt (pas de paquet) : python -m pytest tests
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,149 @@
+import asyncio
+import time
+import types
+
+import anthropic
+import pytest
+
+import ai_engine
+from ai_engine import AnalysisEngine, TokenBucket
+from fake_anthropic import FakeAnthropicServer
+
+MODEL = "modele-du-faux-serveur"
+
+
+class VirtualClock:
+    # Horloge du seau à jetons et des attentes du moteur : les limites par minute se testent sans attendre
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.sleeps.append(delay)
+        # Au moins 1 ns, comme une vraie attente : sinon un reste d'arrondi (1e-15 s) ne ferait plus avancer l'horloge
+        self.now += max(delay, 1e-9)
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = VirtualClock()
+    monkeypatch.setattr(ai_engine, "time", types.SimpleNamespace(monotonic=clock.monotonic,
+                                                                 perf_counter=time.perf_counter))
+    monkeypatch.setattr(ai_engine, "asyncio", types.SimpleNamespace(sleep=clock.sleep, Lock=asyncio.Lock,
+                                                                    Semaphore=asyncio.Semaphore))
+    return clock
+
+
+def run_calls(server, n_calls, max_tokens=16, content="bonjour", record=None, **engine_options):
+    # n_calls appels concurrents ; record(heure virtuelle, arguments) à chaque requête HTTP envoyée
+    async def main():
+        async with anthropic.AsyncAnthropic(api_key="fake-key-pour-les-tests", base_url=server.base_url,
+                                            max_retries=0) as client:
+            engine = AnalysisEngine(client, **engine_options)
+            if record is not None:
+                create = client.messages.create
+
+                async def recorded_create(**kwargs):
+                    record(ai_engine.time.monotonic(), kwargs)
+                    return await create(**kwargs)
+                client.messages.create = recorded_create
+            results = await asyncio.gather(*(engine.create(MODEL, max_tokens, f"{content} {i}")
+                                             for i in range(n_calls)), return_exceptions=True)
+            return engine, results
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("status", [429, 529])
+def test_retries_until_success(clock, status, monkeypatch):
+    delays = []
+    backoff = AnalysisEngine._backoff
+    monkeypatch.setattr(AnalysisEngine, "_backoff",
+                        lambda self, attempt, error: delays.append(backoff(self, attempt, error)) or delays[-1])
+    with FakeAnthropicServer(error_rate=0.4, error_status=status, seed=3) as server:
+        engine, results = run_calls(server, 30, max_retries=20, requests_per_minute=10_000,
+                                    tokens_per_minute=10 ** 9)
+    assert all(isinstance(result, str) for result in results)
+    assert server.errors > 0
+    # Une retentative par réponse en erreur, une requête HTTP par tentative
+    assert engine.stats.retries == server.errors
+    assert engine.stats.calls == server.requests == 30 + server.errors
+    assert engine.stats.errors == 0
+    # Le serveur impose retry-after: 0 : le backoff exponentiel ne s'applique pas
+    assert delays == [0.0] * server.errors
+    assert clock.sleeps.count(0.0) >= server.errors
+
+
+@pytest.mark.parametrize("status", [429, 529])
+def test_gives_up_after_max_retries(clock, status, monkeypatch):
+    # Backoff sans gigue : chaque attente entre deux tentatives se retrouve dans l'horloge
+    monkeypatch.setattr(AnalysisEngine, "_backoff", lambda self, attempt, error: 2.0 ** attempt)
+    with FakeAnthropicServer(error_rate=1.0, error_status=status) as server:
+        engine, results = run_calls(server, 1, max_retries=3)
+    assert isinstance(results[0], anthropic.APIStatusError)
+    assert results[0].status_code == status
+    assert server.requests == 4
+    assert (engine.stats.calls, engine.stats.retries, engine.stats.errors) == (4, 3, 1)
+    assert [delay for delay in clock.sleeps if delay >= 1] == [1.0, 2.0, 4.0]
+
+
+def status_error(status, headers=None):
+    # _backoff ne lit que les en-têtes de la réponse
+    return types.SimpleNamespace(status_code=status, response=types.SimpleNamespace(headers=headers or {}))
+
+
+def test_backoff_is_exponential_with_jitter_without_retry_after():
+    engine = AnalysisEngine(client=None, base_delay=1.0, max_delay=10.0)
+    for attempt in range(6):
+        expected = min(10.0, 2.0 ** attempt)
+        for _ in range(20):
+            assert expected / 2 <= engine._backoff(attempt, status_error(529)) <= expected
+
+
+def test_backoff_follows_retry_after_up_to_max_delay():
+    engine = AnalysisEngine(client=None, base_delay=1.0, max_delay=10.0)
+    assert engine._backoff(0, status_error(429, {"retry-after": "3"})) == 3.0
+    assert engine._backoff(0, status_error(429, {"retry-after": "120"})) == 10.0
+
+
+def test_requests_per_minute_is_respected(clock):
+    # 60 requêtes/minute : rafale de 60, puis une par seconde
+    starts = []
+    with FakeAnthropicServer() as server:
+        engine, results = run_calls(server, 75, record=lambda now, kwargs: starts.append(now),
+                                    requests_per_minute=60, tokens_per_minute=10 ** 9)
+    assert all(isinstance(result, str) for result in results)
+    starts.sort()
+    for sent, now in enumerate(starts, start=1):
+        assert sent <= 60 + now + 1e-6
+    assert starts[-1] == pytest.approx(15.0)
+
+
+def test_tokens_per_minute_is_respected(clock):
+    # Chaque appel réserve len(content) // 4 + max_tokens tokens estimés
+    sent_tokens = []
+    with FakeAnthropicServer() as server:
+        engine, results = run_calls(server, 20, max_tokens=1000,
+                                    record=lambda now, kwargs: sent_tokens.append(
+                                        (now, len(kwargs["messages"][0]["content"]) // 4 + kwargs["max_tokens"])),
+                                    requests_per_minute=10_000, tokens_per_minute=6000)
+    assert all(isinstance(result, str) for result in results)
+    sent_tokens.sort()
+    total = 0
+    for now, tokens in sent_tokens:
+        total += tokens
+        assert total <= 6000 + 100 * now + 1e-6
+    assert sent_tokens[-1][0] > 100
+
+
+def test_token_bucket_waits_for_refill(clock):
+    async def main():
+        bucket = TokenBucket(per_minute=30)
+        await bucket.acquire(30)
+        await bucket.acquire(1)  # Seau vide : 2 s pour un jeton à 30/minute
+        await bucket.acquire(100)  # Plus gros que le seau : attend seulement qu'il soit plein
+    asyncio.run(main())
+    assert clock.now == pytest.approx(2.0 + 60.0, abs=1e-6)
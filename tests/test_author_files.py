@@ -0,0 +1,27 @@
+from author_files import read_author_lines, read_author_shards, write_author_shards
+from segmenter import pack_segments
+
+LINES = [f"[2024-01-{day % 28 + 1:02d} 12:00] message numéro {day} " + "blabla " * (day % 17) + "\n"
+         for day in range(400)]
+LONG_LINE = "[2024-02-01 08:00] " + "très long message " * 300 + "\n"
+BUDGET = 200
+
+
+def test_shards_are_segments(tmp_path):
+    lines = LINES + [LONG_LINE] + LINES[:50]
+    write_author_shards(tmp_path, {"Gis Bis": lines}, BUDGET)
+    assert read_author_shards(tmp_path, "Gis Bis") == pack_segments(lines, BUDGET)
+    assert read_author_lines(tmp_path, "Gis Bis") == lines
+    assert read_author_shards(tmp_path, "Zoé") is None
+
+
+def test_appended_shards_match_full_write(tmp_path):
+    # Ajouts successifs (mode incrémental) : mêmes shards qu'une écriture complète
+    full, appended = tmp_path / "full", tmp_path / "appended"
+    write_author_shards(full, {"Gis": LINES, "Zoé": LINES[:30]}, BUDGET)
+    write_author_shards(appended, {"Gis": LINES[:123]}, BUDGET)
+    write_author_shards(appended, {"Gis": LINES[123:300], "Zoé": LINES[:30]}, BUDGET, mode="a")
+    write_author_shards(appended, {"Gis": LINES[300:]}, BUDGET, mode="a")
+    for author in ("Gis", "Zoé"):
+        assert read_author_shards(appended, author) == read_author_shards(full, author)
+    assert sorted(p.name for p in (appended / "Gis").iterdir()) == sorted(p.name for p in (full / "Gis").iterdir())
@@ -0,0 +1,79 @@
+import dataclasses
+import mmap
+
+import numpy as np
+import pytest
+
+import chat_parser
+from chat_parser import merge_parsed, parse_chat_file, pool_context, split_byte_ranges
+from synthetic_chat import generate_chat
+
+# Messages dont les lignes de suite ressemblent à des en-têtes ou sont vides
+TRICKY_MESSAGES = """\
+1/2/24, 09:00 - Gis: liste :
+1/2/24 rendez-vous à 10:00 - pas un en-tête
+- Zoé: non plus
+
+encore la suite du même message
+1/2/24, 09:01 - Zoé: 😆
+1/2/24, 09:02 - AurelienS: une ligne
+"""
+
+
+@pytest.fixture
+def chat_file(tmp_path):
+    path = tmp_path / "chat.txt"
+    # Un message sur deux sur plusieurs lignes : la plupart des coupures naïves tombent au milieu d'un message
+    generate_chat(path, 3000, n_authors=8, multiline_ratio=0.5, seed=1)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(TRICKY_MESSAGES * 20)
+    return path
+
+
+def assert_same_chat(parsed, expected):
+    for field in dataclasses.fields(expected):
+        value, reference = getattr(parsed, field.name), getattr(expected, field.name)
+        if isinstance(reference, np.ndarray):
+            np.testing.assert_array_equal(value, reference, err_msg=field.name)
+        else:
+            assert value == reference, field.name
+
+
+def test_byte_ranges_start_on_message_headers(chat_file):
+    data = chat_file.read_bytes()
+    with open(chat_file, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        ranges = split_byte_ranges(buf, 64)
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+    for start, _ in ranges[1:]:
+        assert data[start - 1:start] == b"\n"
+        assert chat_parser._is_header(data[start:data.index(b"\n", start)])
+    # Le test n'a de sens que si des coupures naïves tombent dans des lignes de suite
+    naive_cuts = [len(data) * k // 64 for k in range(1, 64)]
+    continuation_cut = [cut for cut in naive_cuts
+                        if not chat_parser._is_header(data[data.rindex(b"\n", 0, cut) + 1:data.index(b"\n", cut)])]
+    assert continuation_cut
+
+
+def test_ranges_merge_like_serial_parse(chat_file):
+    # Chaque plage parsée à part puis fusionnée, sans pool de processus
+    expected = parse_chat_file(chat_file)
+    with open(chat_file, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        ranges = split_byte_ranges(buf, 37)
+    # Comme dans les workers : pas de timestamps par plage, merge_parsed les construit
+    parts = [chat_parser._parse_range(chat_file, start, end, build_timestamps=False) for start, end in ranges]
+    assert all(part.timestamps is None for part in parts)
+    assert_same_chat(merge_parsed(parts), expected)
+
+
+@pytest.mark.skipif(pool_context() is None, reason="parse parallèle indisponible (pas de fork)")
+def test_parallel_parse_matches_serial(chat_file, monkeypatch):
+    expected = parse_chat_file(chat_file, workers=1)
+    # Parse parallèle même sur un petit fichier, en beaucoup de petites plages
+    monkeypatch.setattr(chat_parser, "PARALLEL_MIN_BYTES", 0)
+    monkeypatch.setattr(chat_parser, "CHUNKS_PER_WORKER", 25)
+    parsed = parse_chat_file(chat_file, workers=2)
+    assert_same_chat(parsed, expected)
+    assert len(parsed) == 3000 + 3 * 20
+    assert parsed.messages()[-3] == ("liste : 1/2/24 rendez-vous à 10:00 - pas un en-tête - Zoé: non plus "
+                                     "encore la suite du même message")
@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+from emojis import EMOJI_REGEX, emoji_counts, emoji_frequencies
+
+MESSAGES = [
+    "pas d'emoji, juste des accents éàç et de la ponctuation ’ … €",
+    "😆",
+    "a😀b😀 c",
+    "❤️ ❤ ☀",                  # avec et sans U+FE0F
+    "👍🏽👍 🏽",                 # ton de peau collé, puis seul
+    "❤️🏽",                    # U+FE0F puis ton de peau
+    "🇫🇷🇫🇷 🇫",                 # drapeaux, indicateur régional seul
+    "1️⃣ #⃣ 5",                 # touches
+    "©️ © ™️ ™",               # caractères texte : emoji seulement avec U+FE0F
+    "👨\u200d👩\u200d👧 famille 👩🏽\u200d💻",  # séquences U+200D
+    "🏴\U000E0067\U000E0062\U000E0073\U000E0063\U000E0074\U000E007F",  # drapeau écossais (tags)
+    "😀\u200d",  # U+200D sans suite
+    "\ufe0f sélecteur seul",
+    "✓ ok ★ ♪ ➜ go ❶ ☆ ✗ ♥ ♥️ 🌡 🌡️ ☝🏽 ✨",  # symboles texte, emoji seulement avec U+FE0F
+    "🇫🇷🇫🇷🇫 🇫🇷🇫🇷🇫🇷 x🇫🇷\ufe0f",  # suites impaires, sélecteur après un drapeau
+    "",
+    None,
+]
+
+
+@pytest.mark.parametrize("dtype", ["str", object])
+def test_emoji_counts_matches_regex(dtype):
+    messages = pd.Series(MESSAGES * 3, dtype=dtype)
+    expected = pd.Series(MESSAGES * 3, dtype=object).str.count(EMOJI_REGEX).fillna(0).astype('int32')
+    assert emoji_counts(messages).tolist() == expected.tolist()
+
+
+def test_emoji_counts_on_sliced_column():
+    # Colonne Arrow découpée : offsets du buffer décalés
+    messages = pd.Series(MESSAGES, dtype="str").iloc[3:9]
+    counts = emoji_counts(messages)
+    assert counts.index.tolist() == list(range(3, 9))
+    assert counts.tolist() == [1, 3, 1, 2, 2, 2]
+
+
+@pytest.mark.parametrize("text", ["✓ ok", "★", "♪", "➜ go", "❶", "☆", "✗", "♥", "☀", "❤"])
+def test_text_symbols_are_not_emojis(text):
+    assert emoji_counts(pd.Series([text, text + "\ufe0f"], dtype="str")).tolist() == [0, int(text in "♥☀❤")]
+
+
+def test_emoji_frequencies():
+    messages = pd.Series(["❤️ 😆", "😆😆", "rien"], dtype="str")
+    authors = pd.Series(["Gis", "Zoé", "Gis"], dtype="category")
+    table = emoji_frequencies(messages, authors)
+    assert table.loc["Gis", "❤️"] == 1
+    assert table.loc["Gis", "😆"] == 1
+    assert table.loc["Zoé", "😆"] == 2
@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+from text_features import MENTION_REGEX, QUESTION_REGEX, URL_REGEX, pattern_counts, word_counts
+
+MESSAGES = [
+    "hello world",
+    " hello world",        # espace en tête
+    "hello world  ",       # espaces en fin
+    "a   b \t c",          # espaces répétés et tabulation
+    "\u3000z\u00a0y ",  # espaces Unicode
+    "ligne 1\nligne 2",
+    "",
+    "   ",
+    None,
+]
+
+
+@pytest.mark.parametrize("dtype", ["str", object])
+def test_word_counts_matches_str_split(dtype):
+    expected = [len(message.split()) if message is not None else 0 for message in MESSAGES]
+    counts = word_counts(pd.Series(MESSAGES, dtype=dtype))
+    assert counts.tolist() == expected
+    assert counts.dtype == 'int32'
+
+
+def test_word_counts_keeps_index():
+    messages = pd.Series([" a b ", "c"], index=[10, 20], dtype="str")
+    assert word_counts(messages).to_dict() == {10: 2, 20: 1}
+
+
+PATTERN_MESSAGES = [
+    "quoi ??? et toi ? ?",
+    "?début et fin?",
+    "@Gilles @33612345678 t'as vu ? mail@exemple.fr @ @@x",
+    "\t@tab \f@ff \v@vt \u00a0@insécable \n@ligne",
+    "@",
+    "https://exemple.fr/?q=1&r=@x et www.site.com, http://a http:// b www. c",
+    "http://www.exemple.fr xhttp://a,https://b https:/ www.x?y wwww.z",
+    "https://é.fr ☀️ www.日本.jp?",
+    "fin de message www",
+    ".www.",
+    "",
+    None,
+]
+
+
+def _re2_spaces(regex):
+    # Même regex avec les blancs de re2 (\s = [\t\n\f\r ]), évaluée par re sur des objets Python
+    return regex.replace(r"[^\s@]", "[^\t\n\f\r @]").replace(r"\S", "[^\t\n\f\r ]").replace(r"\s", "[\t\n\f\r ]")
+
+
+def test_pattern_counts_match_regex_counts():
+    # Plusieurs lignes : les motifs ne doivent pas déborder d'un message sur le suivant
+    messages = PATTERN_MESSAGES * 2 + ["?", "?", "@x"]
+    arrow = pd.Series(messages, dtype="str").iloc[1:]
+    expected = pd.Series(messages, dtype=object).iloc[1:]
+    for counts, regex in zip(pattern_counts(arrow), (URL_REGEX, MENTION_REGEX, QUESTION_REGEX)):
+        assert counts.tolist() == expected.str.count(_re2_spaces(regex)).fillna(0).astype('int32').tolist()
+        assert counts.index.equals(arrow.index)
+        assert counts.dtype == 'int32'
+
+
+def test_chained_mentions_count_once():
+    # str.count sur Arrow réancre ^ après chaque correspondance et comptait 2 mentions ici
+    _, mentions, _ = pattern_counts(pd.Series(["\t@a@b", "@a@b@c"], dtype="str"))
+    assert mentions.tolist() == [1, 1]
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+from chat_parser import NAT
+
+MEDIA_PLACEHOLDER = "<Media omitted>"
+URL_REGEX = r"https?://\S+|www\.\S+"
+# Mention WhatsApp : @ en début de mot (@33612345678, @Gilles...)
+MENTION_REGEX = r"(?:^|\s)@[^\s@]"
+# Une suite de points d'interrogation compte pour une seule question ("quoi ???")
+QUESTION_REGEX = r"\?+"
+# Blancs de \s pour re2 (moteur regex des chaînes Arrow) : ni U+000B ni espaces Unicode
+_RE2_SPACES = np.frombuffer(b"\t\n\f\r ", dtype=np.uint8)
+_SCAN_BLOCK = 1 << 20
+
+# Types de messages par nombre de mots : bornes (a, b] et libellés
+MESSAGE_TYPE_BINS = [-np.inf, 3, 10, np.inf]
+MESSAGE_TYPE_LABELS = ['Court (1-3 mots)', 'Moyen (4-10 mots)', 'Long (11+ mots)']
+
+
+def _is_arrow(messages):
+    return getattr(messages.dtype, 'storage', None) == 'pyarrow'
+
+
+def word_counts(messages):
+    # Même découpage que str.split() (espaces Unicode compris)
+    if _is_arrow(messages):
+        # Chaînes Arrow : découpage et comptage natifs, sans passer par des objets Python.
+        # utf8_split_whitespace garde un mot vide par espace en tête ou en fin (et pour "") : on retire
+        # ces espaces d'abord, et un message vide ou blanc compte 0 mot
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        trimmed = pc.utf8_trim_whitespace(pa.array(messages.array))
+        lengths = pc.if_else(pc.equal(trimmed, ""), 0, pc.list_value_length(pc.utf8_split_whitespace(trimmed)))
+        return pd.Series(lengths.to_numpy(zero_copy_only=False), index=messages.index).fillna(0).astype('int32')
+    return messages.str.split().str.len().fillna(0).astype('int32')
+
+
+def _count(messages, regex):
+    return messages.str.count(regex).fillna(0).astype('int32')
+
+
+def _arrow_pattern_counts(strings):
+    # Nombres d'URLs, de mentions et de questions de chaque message, en une seule passe sur les octets
+    # UTF-8 du buffer Arrow : URL_REGEX, MENTION_REGEX et QUESTION_REGEX avec les blancs de re2 (_RE2_SPACES).
+    # Contrairement à str.count sur Arrow, ^ ne correspond qu'au début du message (pas après chaque
+    # correspondance : "@a@b" est une seule mention). Un motif ne commence que sur un octet ASCII
+    # ? @ : (http://) ou . (www.)
+    _, offsets_buffer, data_buffer = strings.buffers()
+    offsets = np.frombuffer(offsets_buffer, dtype=np.int64, count=len(strings) + 1, offset=strings.offset * 8)
+    counts = np.zeros((3, len(strings)), dtype=np.int32)
+    if data_buffer is None or offsets[-1] == offsets[0]:
+        return counts
+    start, end = int(offsets[0]), int(offsets[-1])
+    data = np.frombuffer(data_buffer, dtype=np.uint8)[:end]
+    positions = []
+    for begin in range(start, end, _SCAN_BLOCK):
+        block = data[begin:begin + _SCAN_BLOCK]
+        positions.append(np.flatnonzero((block == ord('?')) | (block == ord('@')) | (block == ord(':'))
+                                        | (block == ord('.'))) + begin)
+    positions = np.concatenate(positions)
+    rows = np.searchsorted(offsets, positions, side='right') - 1
+    row_start, row_end = offsets[rows], offsets[rows + 1]
+
+    def byte_at(shift):
+        # Octet à position + shift, espace en dehors du message (début ou fin de chaîne)
+        at = positions + shift
+        return np.where((at >= row_start) & (at < row_end), data[np.clip(at, 0, end - 1)], ord(' '))
+
+    def preceded_by(text):
+        return np.logical_and.reduce([byte_at(k - len(text)) == byte for k, byte in enumerate(text)])
+
+    current, before, after = data[positions], byte_at(-1), byte_at(1)
+    questions = (current == ord('?')) & (before != ord('?'))
+    mentions = (current == ord('@')) & np.isin(before, _RE2_SPACES) & ~np.isin(after, _RE2_SPACES) & (after != ord('@'))
+    # Début d'URL suivi d'au moins un caractère non blanc ; \S+ va jusqu'au blanc suivant, donc
+    # plusieurs débuts dans le même mot (http://www.exemple.fr) ne font qu'une URL
+    scheme = ((current == ord(':')) & (after == ord('/')) & (byte_at(2) == ord('/'))
+              & ~np.isin(byte_at(3), _RE2_SPACES))
+    http, https = scheme & preceded_by(b"http"), scheme & preceded_by(b"https")
+    www = (current == ord('.')) & preceded_by(b"www") & ~np.isin(after, _RE2_SPACES)
+    url_starts = np.concatenate([positions[http] - 4, positions[https] - 5, positions[www] - 3])
+    order = np.argsort(url_starts, kind='stable')
+    url_starts, url_rows = url_starts[order], np.concatenate([rows[http], rows[https], rows[www]])[order]
+    new_url = np.ones(len(url_starts), dtype=bool)
+    for i in np.flatnonzero(url_rows[1:] == url_rows[:-1]) + 1:
+        new_url[i] = np.isin(data[url_starts[i - 1]:url_starts[i]], _RE2_SPACES).any()
+
+    for k, found_rows in enumerate((url_rows[new_url], rows[mentions], rows[questions])):
+        counts[k] = np.bincount(found_rows, minlength=len(strings))
+    return counts
+
+
+def pattern_counts(messages):
+    # (nb_urls, nb_mentions, nb_questions) : une passe sur les octets pour les chaînes Arrow,
+    # une regex par motif sinon
+    if _is_arrow(messages):
+        import pyarrow as pa
+        strings = pa.array(messages.array)
+        if isinstance(strings, pa.ChunkedArray):
+            strings = strings.combine_chunks()
+        counts = _arrow_pattern_counts(strings.cast(pa.large_string()))
+        return tuple(pd.Series(column, index=messages.index, dtype='int32') for column in counts)
+    return tuple(_count(messages, regex) for regex in (URL_REGEX, MENTION_REGEX, QUESTION_REGEX))
+
+
+def hours_from_timestamps(timestamps):
+    # Heure de chaque message depuis les secondes epoch du parser (NA si date ou heure invalide)
+    values = timestamps.to_numpy()
+    hours = pd.array((values % 86400) // 3600, dtype='Int8')
+    hours[values == NAT] = pd.NA
+    return pd.Series(hours, index=timestamps.index)
+
+
+def add_text_features(df):
+    # Colonnes dérivées du texte, chacune en une opération sur toute la colonne
+    messages = df['message']
+    df['nb_mots'] = word_counts(messages)
+    df['hour'] = hours_from_timestamps(df['timestamp'])
+    df['type_message'] = pd.cut(df['nb_mots'], bins=MESSAGE_TYPE_BINS, labels=MESSAGE_TYPE_LABELS)
+    df['contient_media'] = messages.str.contains(MEDIA_PLACEHOLDER, regex=False, na=False).astype(bool)
+    df['nb_urls'], df['nb_mentions'], df['nb_questions'] = pattern_counts(messages)
@@ -0,0 +1,58 @@
+import asyncio
+from dataclasses import dataclass, field
+
+from segmenter import count_tokens_batch
+
+
+@dataclass
+class ReduceTrace:
+    # Forme de l'arbre de réduction : pour chaque niveau, le nombre d'entrées de chaque nœud
+    levels: list = field(default_factory=list)
+
+    @property
+    def depth(self):
+        return len(self.levels)
+
+    def describe(self):
+        return " → ".join(f"{len(level)} nœud(s) [{', '.join(map(str, level))}]" for level in self.levels)
+
+
+def group_by_budget(items, budget):
+    # Textes consécutifs regroupés tant que leur total de tokens tient dans le budget
+    groups = []
+    current, current_tokens = [], 0
+    for item, tokens in zip(items, count_tokens_batch(items)):
+        if current and current_tokens + tokens > budget:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    if len(items) > 1 and len(groups) == len(items):
+        # Chaque texte dépasse la moitié du budget : on fusionne quand même par paires,
+        # sinon l'arbre ne rétrécirait jamais
+        groups = [items[i:i + 2] for i in range(0, len(items), 2)]
+    return groups
+
+
+async def tree_reduce(items, budget, merge, final):
+    # Réduction hiérarchique : tant que tout ne tient pas dans un seul prompt, les textes
+    # sont fusionnés par groupes (merge, en parallèle), puis on recommence sur les résultats.
+    # final reçoit le dernier groupe. Renvoie (résultat, trace), résultat None si une étape échoue.
+    trace = ReduceTrace()
+    level = 0
+    while True:
+        groups = group_by_budget(items, budget)
+        trace.levels.append([len(group) for group in groups])
+        if len(groups) == 1:
+            return await final(groups[0]), trace
+
+        async def reduce_group(index, group):
+            # Un groupe d'un seul texte remonte tel quel au niveau suivant
+            return group[0] if len(group) == 1 else await merge(group, level, index)
+
+        items = await asyncio.gather(*(reduce_group(index, group) for index, group in enumerate(groups)))
+        if any(item is None for item in items):
+            return None, trace
+        level += 1